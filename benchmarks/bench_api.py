@@ -0,0 +1,538 @@
+"""
+Нагрузочный бенчмарк API: гоняет FastAPI-приложение из src/main.py в том же процессе
+через ASGI-транспорт httpx, без сети и без uvicorn.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_api                      # in-memory Mongo и Redis
+    python -m benchmarks.bench_api --backend local      # mongod и redis-server из PATH
+    python -m benchmarks.bench_api --save-baseline      # перезаписать эталон
+
+Для каждого сценария печатает пропускную способность, p50/p99 задержки и пиковые
+аллокации на запрос, затем сравнивает с benchmarks/baseline.json.
+Регрессия сверх --tolerance завершает процесс с кодом 1.
+
+Скорость и задержки зависят от машины, поэтому в эталоне и при сравнении они берутся
+относительно эталонного запроса, замеренного в том же прогоне до и после сценариев: пустой FastAPI-обработчик
+через тот же ASGI-транспорт. rps_rel — доля от его rps, p99_rel — p99 в его медианах.
+Аллокации от машины не зависят и сравниваются как есть.
+"""
+
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+for _name, _value in {
+    "MODE": "TEST",
+    "DB_HOST": "localhost",
+    "DB_PORT": "27017",
+    "DB_USER": "bench",
+    "DB_PASS": "bench",
+    "DB_NAME": "bench",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "JWT_SECRET_KEY": "bench-secret-key-of-at-least-32-bytes",
+    "JWT_ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    # весь трафик бенчмарка идёт с одного адреса
+    "LOGIN_RATE_IP_CAPACITY": "1000000",
+    "LOGIN_RATE_IP_REFILL": "1000000",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import httpx  # noqa: E402
+
+from benchmarks.standins import InMemoryDBManager, InMemoryMongoClient, InMemoryRedis  # noqa: E402
+from src.api.dependencies import get_db  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from src.config import settings  # noqa: E402
+from src.init import invalidation_bus, redis_manager  # noqa: E402
+from src.main import app  # noqa: E402
+from src.schemas.users import UserAddDTO  # noqa: E402
+from src.services.auth import AuthService  # noqa: E402
+from src.utils.db_manager import DBManager, secondary_read_preference  # noqa: E402
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+DB_NAME = "bench"
+SECONDARY_READS = secondary_read_preference(settings.DB_SECONDARY_READ_PREFERENCE, settings.DB_MAX_STALENESS_SECONDS)
+PASSWORD = "bench-password"
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    errors: int
+    rps: float
+    kib_per_s: float
+    p50_ms: float
+    p99_ms: float
+    alloc_kib: float
+    # относительно эталонного запроса того же прогона, см. normalize()
+    rps_rel: float = 0.0
+    kib_per_s_rel: float = 0.0
+    p99_rel: float = 0.0
+
+
+@dataclass
+class SeededUser:
+    id: str
+    email: str
+    token: str
+
+
+class BenchState:
+    def __init__(self, db_factory: Callable[[], DBManager], flush_cache: Callable[[], Awaitable[Any]]):
+        self.db_factory = db_factory
+        self.flush_cache = flush_cache
+        self.users: list[SeededUser] = []
+        self.admin: SeededUser | None = None
+        self.etag = ""
+        self.counter = 0
+
+    def next_index(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_for(check: Callable[[], Awaitable[Any]], timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await check()
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def flush_cache() -> None:
+    """Сбрасывает Redis и локальные кэши воркера"""
+    await redis_manager._redis.flushall()
+    await invalidation_bus.dispatch(None)
+
+
+@asynccontextmanager
+async def memory_backend() -> AsyncIterator[BenchState]:
+    mongo_client = InMemoryMongoClient()
+    redis_manager._redis = InMemoryRedis()  # type: ignore
+
+    def db_factory() -> DBManager:
+        return InMemoryDBManager(mongo_client, DB_NAME, SECONDARY_READS)
+
+    yield BenchState(db_factory, flush_cache)
+
+
+@asynccontextmanager
+async def local_backend() -> AsyncIterator[BenchState]:
+    mongod, redis_server = shutil.which("mongod"), shutil.which("redis-server")
+    if not mongod or not redis_server:
+        raise SystemExit("--backend local требует mongod и redis-server в PATH")
+
+    mongo_port, redis_port = _free_port(), _free_port()
+    with tempfile.TemporaryDirectory(prefix="bench-mongo-") as dbpath:
+        processes = [
+            subprocess.Popen(
+                [mongod, "--dbpath", dbpath, "--port", str(mongo_port), "--bind_ip", "127.0.0.1"],
+                stdout=subprocess.DEVNULL,
+            ),
+            subprocess.Popen(
+                [redis_server, "--port", str(redis_port), "--save", "", "--appendonly", "no"],
+                stdout=subprocess.DEVNULL,
+            ),
+        ]
+        try:
+            db_url = f"mongodb://127.0.0.1:{mongo_port}"
+
+            def db_factory() -> DBManager:
+                return DBManager(db_url=db_url, db_name=DB_NAME, secondary_reads=SECONDARY_READS)
+
+            async def ping_mongo() -> None:
+                async with db_factory() as db:
+                    await db.client.admin.command("ping")
+
+            await _wait_for(ping_mongo)
+            redis_manager.host, redis_manager.port = "127.0.0.1", redis_port
+            await redis_manager.connect()
+            await _wait_for(redis_manager._redis.ping)
+            yield BenchState(db_factory, flush_cache)
+        finally:
+            await redis_manager.close()
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+
+async def seed(state: BenchState, count: int) -> None:
+    """Заводит пользователей напрямую через репозиторий, минуя bcrypt на каждого."""
+    auth = AuthService()
+    hashed_password = auth.hash_password(PASSWORD)
+    async with state.db_factory() as db:
+        await db.init_indexes()
+        users = await db.users.add_batch(
+            [
+                UserAddDTO(
+                    first_name="Bench",
+                    last_name=f"User{i}",
+                    email=f"user{i}@bench.example.com",
+                    hashed_password=hashed_password,
+                    role="admin" if i == 0 else "user",
+                )
+                for i in range(count + 1)
+            ]
+        )
+    seeded = [
+        SeededUser(user.id, user.email, auth.create_access_token({"user_id": user.id, "role": user.role}))
+        for user in sorted(users, key=lambda user: int(user.last_name.removeprefix("User")))
+    ]
+    state.admin, state.users = seeded[0], seeded[1:]
+
+
+def _auth(user: SeededUser) -> dict[str, str]:
+    return {"Cookie": f"access_token={user.token}"}
+
+
+async def op_register(client: httpx.AsyncClient, state: BenchState, i: int) -> httpx.Response:
+    return await client.post(
+        "/auth/register",
+        json={
+            "email": f"register{state.next_index()}@bench.example.com",
+            "password": PASSWORD,
+            "first_name": "Bench",
+            "last_name": "Register",
+        },
+    )
+
+
+async def op_login(client: httpx.AsyncClient, state: BenchState, i: int) -> httpx.Response:
+    user = state.users[i % len(state.users)]
+    return await client.post("/auth/login", json={"email": user.email, "password": PASSWORD})
+
+
+async def op_me_cache_hit(client: httpx.AsyncClient, state: BenchState, i: int) -> httpx.Response:
+    return await client.get("/auth/me", headers=_auth(state.users[0]))
+
+
+async def op_me_not_modified(client: httpx.AsyncClient, state: BenchState, i: int) -> httpx.Response:
+    return await client.get("/auth/me", headers=_auth(state.users[0]) | {"If-None-Match": state.etag})
+
+
+async def remember_me_etag(client: httpx.AsyncClient, state: BenchState) -> None:
+    state.etag = (await op_me_cache_hit(client, state, 0)).headers["ETag"]
+
+
+async def op_me_cache_miss(client: httpx.AsyncClient, state: BenchState, i: int) -> httpx.Response:
+    # у каждого запроса свой пользователь, поэтому ключ кэша никогда не совпадает
+    return await client.get("/auth/me", headers=_auth(state.users[i % len(state.users)]))
+
+
+async def op_edit_me(client: httpx.AsyncClient, state: BenchState, i: int) -> httpx.Response:
+    user = state.users[i % len(state.users)]
+    return await client.put(
+        "/auth/edit_me",
+        headers=_auth(user),
+        json={"email": user.email, "password": PASSWORD, "first_name": "Edited", "last_name": f"Me{i}"},
+    )
+
+
+async def op_edit_user(client: httpx.AsyncClient, state: BenchState, i: int) -> httpx.Response:
+    user = state.users[i % len(state.users)]
+    return await client.put(
+        "/auth/edit_user",
+        params={"user_edit_email": user.email},
+        headers=_auth(state.admin),  # type: ignore
+        json={"email": user.email, "first_name": "Edited", "last_name": f"Admin{i}"},
+    )
+
+
+async def op_login_throttled(client: httpx.AsyncClient, state: BenchState, i: int) -> httpx.Response:
+    # перебор пароля к одному email: после исчерпания корзины bcrypt больше не вызывается
+    return await client.post("/auth/login", json={"email": state.users[-1].email, "password": "wrong-password"})
+
+
+async def exhaust_login_bucket(client: httpx.AsyncClient, state: BenchState) -> None:
+    for i in range(1000):
+        if (await op_login_throttled(client, state, i)).status_code == 429:
+            return
+    raise RuntimeError("корзина попыток входа не исчерпалась")
+
+
+async def hang_redis(client: httpx.AsyncClient, state: BenchState) -> None:
+    await flush_cache()
+    redis_manager._redis.latency = 10.0  # type: ignore
+    # первые запросы ждут таймаута, пока цепь не разомкнётся; замеряем установившийся режим
+    while not redis_manager.breaker.is_open:
+        await op_me_cache_miss(client, state, 0)
+
+
+async def hang_redis_closed(client: httpx.AsyncClient, state: BenchState) -> None:
+    # цепь замкнута: первый залп запросов ждёт таймаутов Redis, пока она не разомкнётся
+    redis_manager.breaker.record_success()
+    redis_manager._redis.latency = 10.0  # type: ignore
+
+
+async def restore_redis(client: httpx.AsyncClient, state: BenchState) -> None:
+    redis_manager._redis.latency = 0.0  # type: ignore
+    redis_manager.breaker.record_success()
+
+
+@dataclass
+class Scenario:
+    op: Callable[[httpx.AsyncClient, BenchState, int], Awaitable[httpx.Response]]
+    hashing: bool = False  # bcrypt на каждый запрос — запросов берём --hash-requests
+    flush: bool = False  # сбросить кэш перед замером
+    expected_status: int = 200
+    setup: Callable[[httpx.AsyncClient, BenchState], Awaitable[None]] | None = None
+    teardown: Callable[[httpx.AsyncClient, BenchState], Awaitable[None]] | None = None
+    one_wave: bool = False  # ровно --concurrency запросов, по одному на каждого клиента
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "register": Scenario(op_register, hashing=True),
+    "login": Scenario(op_login, hashing=True),
+    "login_throttled": Scenario(op_login_throttled, expected_status=429, setup=exhaust_login_bucket),
+    "me_cache_hit": Scenario(op_me_cache_hit),
+    "me_cache_miss": Scenario(op_me_cache_miss, flush=True),
+    "me_not_modified": Scenario(op_me_not_modified, expected_status=304, setup=remember_me_etag),
+    # Redis завис: первый залп ждёт таймаутов, пока цепь не разомкнётся (tripping),
+    # дальше запросы не ждут вовсе (hang, цепь уже разомкнута до замера)
+    "me_redis_tripping": Scenario(
+        op_me_cache_miss, flush=True, setup=hang_redis_closed, teardown=restore_redis, one_wave=True
+    ),
+    "me_redis_hang": Scenario(op_me_cache_miss, flush=True, setup=hang_redis, teardown=restore_redis),
+    "edit_me": Scenario(op_edit_me, hashing=True),
+    "edit_user": Scenario(op_edit_user),
+}
+
+
+# минимальный запрос через FastAPI и ASGI-транспорт: мера скорости машины для нормировки
+reference_app = FastAPI()
+
+
+@reference_app.get("/ping")
+async def ping() -> dict[str, str]:
+    return {"status": "OK"}
+
+
+async def op_reference(client: httpx.AsyncClient, state: BenchState, i: int) -> httpx.Response:
+    return await client.get("/ping")
+
+
+REFERENCE = "_reference"
+
+
+async def measure_reference(state: BenchState, args: argparse.Namespace) -> ScenarioResult:
+    transport = httpx.ASGITransport(app=reference_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return await run_scenario(
+            client, state, REFERENCE, args.requests, args.concurrency, args.alloc_samples, Scenario(op_reference)
+        )
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    state: BenchState,
+    name: str,
+    requests: int,
+    concurrency: int,
+    alloc_samples: int,
+    scenario: Scenario | None = None,
+) -> ScenarioResult:
+    scenario = scenario or SCENARIOS[name]
+    op = scenario.op
+    if scenario.setup:
+        await scenario.setup(client, state)
+    if scenario.flush:
+        await state.flush_cache()
+    else:
+        await op(client, state, 0)  # прогрев
+
+    latencies: list[float] = []
+    errors = 0
+    body_bytes = 0
+    next_request = 0
+
+    async def worker() -> None:
+        nonlocal next_request, errors, body_bytes
+        while next_request < requests:
+            i = next_request
+            next_request += 1
+            started = time.perf_counter()
+            response = await op(client, state, i)
+            latencies.append(time.perf_counter() - started)
+            body_bytes += len(response.content)
+            if response.status_code != scenario.expected_status:
+                errors += 1
+            # стенды в памяти не уступают цикл событий: без этого один воркер
+            # прогонит все запросы, пока таймеры остальных ждут
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    # аллокации меряем отдельным последовательным проходом: tracemalloc искажает задержки
+    if scenario.flush:
+        await state.flush_cache()
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(alloc_samples):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await op(client, state, requests + i)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+        if scenario.teardown:
+            await scenario.teardown(client, state)
+
+    latencies.sort()
+    return ScenarioResult(
+        name=name,
+        requests=requests,
+        errors=errors,
+        rps=requests / elapsed,
+        kib_per_s=body_bytes / 1024 / elapsed,
+        p50_ms=statistics.median(latencies) * 1000,
+        p99_ms=latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        alloc_kib=statistics.mean(peaks) / 1024 if peaks else 0.0,
+    )
+
+
+def normalize(results: list[ScenarioResult], reference: ScenarioResult) -> None:
+    for result in results:
+        result.rps_rel = result.rps / reference.rps
+        result.kib_per_s_rel = result.kib_per_s / reference.rps
+        result.p99_rel = result.p99_ms / reference.p50_ms
+
+
+def compare_with_baseline(results: list[ScenarioResult], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if not base:
+            continue
+        if result.rps_rel < base["rps_rel"] * (1 - tolerance):
+            regressions.append(f"{result.name}: rps_rel {result.rps_rel:.4f} < {base['rps_rel']:.4f}")
+        if result.kib_per_s_rel < base["kib_per_s_rel"] * (1 - tolerance):
+            regressions.append(
+                f"{result.name}: kib_per_s_rel {result.kib_per_s_rel:.4f} < {base['kib_per_s_rel']:.4f}"
+            )
+        if result.p99_rel > base["p99_rel"] * (1 + tolerance):
+            regressions.append(f"{result.name}: p99_rel {result.p99_rel:.1f} > {base['p99_rel']:.1f}")
+        if result.alloc_kib > base["alloc_kib"] * (1 + tolerance):
+            regressions.append(f"{result.name}: alloc {result.alloc_kib:.1f}KiB > {base['alloc_kib']:.1f}KiB")
+    return regressions
+
+
+def print_results(results: list[ScenarioResult], reference: ScenarioResult) -> None:
+    print(
+        f"{'scenario':<18}{'reqs':>7}{'errors':>8}{'rps':>11}{'KiB/s':>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'alloc KiB':>11}{'rps_rel':>10}{'p99_rel':>10}"
+    )
+    for r in [reference, *results]:
+        print(
+            f"{r.name:<18}{r.requests:>7}{r.errors:>8}{r.rps:>11.1f}{r.kib_per_s:>10.1f}"
+            f"{r.p50_ms:>10.2f}{r.p99_ms:>10.2f}{r.alloc_kib:>11.1f}{r.rps_rel:>10.4f}{r.p99_rel:>10.1f}"
+        )
+
+
+async def main(args: argparse.Namespace) -> int:
+    logging.getLogger().setLevel(args.log_level)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    backend = local_backend if args.backend == "local" else memory_backend
+    names = args.scenarios or list(SCENARIOS)
+    async with backend() as state:
+        async def get_bench_db() -> AsyncIterator[DBManager]:
+            async with state.db_factory() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = get_bench_db
+        # эталон замеряется до и после сценариев, берётся более быстрый замер
+        reference_before = await measure_reference(state, args)
+        await seed(state, max(args.requests, args.hash_requests) + args.alloc_samples + 1)
+
+        # куки не сохраняем: иначе /auth/login после первого ответа вернёт 409
+        cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as client:
+            results = []
+            for name in names:
+                scenario = SCENARIOS[name]
+                if scenario.one_wave:
+                    requests = args.concurrency
+                else:
+                    requests = args.hash_requests if scenario.hashing else args.requests
+                results.append(
+                    await run_scenario(client, state, name, requests, args.concurrency, args.alloc_samples)
+                )
+        app.dependency_overrides.pop(get_db, None)
+
+        reference = min(reference_before, await measure_reference(state, args), key=lambda r: r.p50_ms)
+    normalize([reference, *results], reference)
+
+    print_results(results, reference)
+    failed = [r.name for r in results if r.errors]
+    if failed:
+        print(f"\nОшибочные ответы в сценариях: {', '.join(failed)}", file=sys.stderr)
+        return 1
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({r.name: asdict(r) for r in [reference, *results]}, indent=2) + "\n")
+        print(f"\nЭталон сохранён в {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"\nЭталон {args.baseline} не найден, сравнение пропущено (--save-baseline чтобы создать)")
+        return 0
+
+    regressions = compare_with_baseline(results, json.loads(args.baseline.read_text()), args.tolerance)
+    if regressions:
+        print("\nРЕГРЕССИЯ относительно эталона:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    print("\nРегрессий относительно эталона нет")
+    return 0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["memory", "local"], default="memory")
+    parser.add_argument("--scenarios", nargs="*", choices=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на лёгкий сценарий")
+    parser.add_argument("--hash-requests", type=int, default=40, help="запросов на сценарий с bcrypt")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--alloc-samples", type=int, default=20)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимое ухудшение, доля")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
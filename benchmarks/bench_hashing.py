@@ -0,0 +1,89 @@
+"""
+Сравнение схем хэширования паролей на текущей машине.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_hashing --target-ms 250
+
+Для каждой доступной схемы подбирает стоимость под --target-ms так же, как это делает
+AuthService.calibrate_password_hashing в мастер-процессе src.server, затем замеряет hash/verify
+и пропускную способность при --threads параллельных потоках.
+Схема с наибольшим числом проверок в секунду при заданной задержке — кандидат
+в PASSWORD_HASH_SCHEME.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import statistics
+import time
+
+from passlib.context import CryptContext
+from passlib.hash import argon2
+
+from src.utils.password_hashing import calibrated_crypt_context
+
+PASSWORD = "bench-password"
+
+
+def measure(context: CryptContext, samples: int, threads: int) -> dict[str, float]:
+    hashed = context.hash(PASSWORD)
+    hash_ms, verify_ms = [], []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash(PASSWORD)
+        hash_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        verify_ms.append((time.perf_counter() - started) * 1000)
+
+    # bcrypt и argon2-cffi отпускают GIL, поэтому потоки показывают масштабирование по ядрам
+    with ThreadPoolExecutor(threads) as pool:
+        started = time.perf_counter()
+        list(pool.map(lambda _: context.verify(PASSWORD, hashed), range(samples * threads)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "hash_ms": statistics.median(hash_ms),
+        "verify_ms": statistics.median(verify_ms),
+        "verify_per_sec": samples * threads / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=int, default=250)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--bcrypt-rounds", type=int, default=10, help="нижняя граница rounds")
+    parser.add_argument("--argon2-time-cost", type=int, default=1, help="нижняя граница time_cost")
+    parser.add_argument("--argon2-memory-cost", type=int, default=65536, help="КиБ")
+    parser.add_argument("--argon2-parallelism", type=int, default=4)
+    args = parser.parse_args()
+
+    schemes = ["bcrypt"] + (["argon2"] if argon2.has_backend() else [])
+    if "argon2" not in schemes:
+        print("argon2-cffi не установлен, argon2 пропущен")
+
+    print(f"{'scheme':<8}{'cost':>24}{'hash ms':>10}{'verify ms':>11}{'verify/s':>10}")
+    for scheme in schemes:
+        context = calibrated_crypt_context(
+            scheme,
+            args.target_ms,
+            args.bcrypt_rounds,
+            args.argon2_time_cost,
+            args.argon2_memory_cost,
+            args.argon2_parallelism,
+        )
+        if scheme == "bcrypt":
+            cost = f"rounds={context.handler().default_rounds}"
+        else:
+            handler = context.handler()
+            cost = f"t={handler.default_rounds},m={handler.memory_cost},p={handler.parallelism}"
+        result = measure(context, args.samples, args.threads)
+        print(
+            f"{scheme:<8}{cost:>24}{result['hash_ms']:>10.1f}"
+            f"{result['verify_ms']:>11.1f}{result['verify_per_sec']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Задержка инвалидации: от записи в users до вызова обработчика InvalidationBus в каждом воркере.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_invalidation --workers 4 --writes 500
+
+Поднимает in-memory Mongo и Redis, ChangeStreamWatcher и по InvalidationBus на «воркер»
+(все в одном процессе, общий Redis pub/sub), пишет через UsersRepository.edit
+и меряет время до доставки события последнему воркеру. В конце перезапускает
+наблюдателя и проверяет, что события, записанные без него, дочитываются по resume token.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("MODE", "TEST")
+for _name in ("DB_HOST", "DB_USER", "DB_PASS", "DB_NAME", "REDIS_HOST"):
+    os.environ.setdefault(_name, "bench")
+for _name in ("DB_PORT", "REDIS_PORT"):
+    os.environ.setdefault(_name, "0")
+
+from benchmarks.standins import InMemoryDBManager, InMemoryMongoClient, InMemoryRedis  # noqa: E402
+from src.connectors.redis_connector import RedisManager  # noqa: E402
+from src.schemas.users import UserAddDTO, UserPutAdminDTO  # noqa: E402
+from src.utils.invalidation import ChangeStreamWatcher, InvalidationBus  # noqa: E402
+
+CHANNEL = "invalidation:users"
+
+
+async def main(args: argparse.Namespace) -> None:
+    redis_manager = RedisManager("memory", 0)
+    redis_manager._redis = InMemoryRedis()  # type: ignore
+    db = InMemoryDBManager(InMemoryMongoClient(), "bench")
+    await db.init_indexes()
+    user = await db.users.add(
+        UserAddDTO(first_name="Bench", last_name="User", email="user@bench.example.com", hashed_password="x", role="user")
+    )
+
+    received: dict[int, list[float]] = {}
+    buses = []
+    for worker in range(args.workers):
+        bus = InvalidationBus(redis_manager, CHANNEL)
+        bus.subscribe(lambda user_id, worker=worker: received.setdefault(worker, []).append(time.perf_counter()))
+        buses.append(bus)
+    tasks = [asyncio.create_task(bus.listen()) for bus in buses]
+    watcher_task = asyncio.create_task(ChangeStreamWatcher(db.users.collection, buses[0], redis_manager).run())
+    await asyncio.sleep(0.05)
+
+    latencies = []
+    for i in range(args.writes):
+        started = time.perf_counter()
+        await db.users.edit(
+            UserPutAdminDTO(email=user.email, first_name="Bench", last_name=f"Edit{i}"), id=user.id
+        )
+        while any(len(received.get(worker, [])) <= i for worker in range(args.workers)):
+            await asyncio.sleep(0)
+        latencies.append(max(received[worker][i] for worker in range(args.workers)) - started)
+
+    # рестарт наблюдателя: записи без него должны дочитаться с сохранённого resume token
+    watcher_task.cancel()
+    await asyncio.gather(watcher_task, return_exceptions=True)
+    await redis_manager.delete(f"change_stream:{db.users.collection.name}:leader")
+    for i in range(args.missed):
+        await db.users.edit(UserPutAdminDTO(email=user.email, first_name="Missed", last_name=f"Edit{i}"), id=user.id)
+    watcher_task = asyncio.create_task(ChangeStreamWatcher(db.users.collection, buses[0], redis_manager).run())
+    expected = args.writes + args.missed
+    deadline = time.monotonic() + 5
+    while any(len(received.get(worker, [])) < expected for worker in range(args.workers)):
+        if time.monotonic() > deadline:
+            raise SystemExit("события, записанные во время рестарта наблюдателя, потеряны")
+        await asyncio.sleep(0.01)
+
+    for task in [*tasks, watcher_task]:
+        task.cancel()
+    await asyncio.gather(*tasks, watcher_task, return_exceptions=True)
+
+    latencies.sort()
+    print(f"воркеров: {args.workers}, записей: {args.writes}")
+    print(f"p50 {statistics.median(latencies) * 1000:.3f} ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms")
+    print(f"после рестарта наблюдателя дочитано {args.missed} из {args.missed} пропущенных событий")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--missed", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Маппинг документов users: прежний DataMapper с UserDTO против NamedTuple-записи.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_mapping --users 100000
+
+память        байт на пользователя, которые маппинг добавляет и которые остаются после того,
+              как документы из курсора отпущены, — столько стоит каждый закэшированный
+              пользователь сверх строк его полей (они одни и те же в обоих вариантах)
+маппинг       документов в секунду от dict из Motor до доменной сущности
+в UserDTO     записей в секунду при переводе в публичный DTO на границе API
+"""
+
+from typing import Any, Callable
+import argparse
+import gc
+import time
+import tracemalloc
+
+from bson import ObjectId
+
+from src.repositories.mappers.mappers import UserDataMapper
+from src.schemas.users import UserDTO
+
+
+def legacy_map(data: dict[str, Any]) -> UserDTO:
+    # прежний DataMapper.map_to_domain_entity
+    if "_id" in data:
+        data["id"] = str(data.pop("_id"))
+    return UserDTO.model_validate(data)
+
+
+def make_documents(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "_id": ObjectId(),
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "email": f"user{i}@bench.example.com",
+            "role": "user",
+            "version": 1,
+        }
+        for i in range(count)
+    ]
+
+
+def retained_bytes_per_user(mapper: Callable[[dict[str, Any]], Any], count: int) -> float:
+    documents = make_documents(count)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    entities = [mapper(document) for document in documents]
+    del documents
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del entities
+    return (after - before) / count
+
+
+def throughput(fn: Callable[[Any], Any], items: list[Any]) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'':<22}{'байт/польз.':>12}{'маппинг/с':>12}")
+    for name, mapper in [("UserDTO (прежний)", legacy_map), ("UserRecord", UserDataMapper.map_to_domain_entity)]:
+        memory = retained_bytes_per_user(mapper, args.users)
+        rate = throughput(mapper, make_documents(args.users))
+        print(f"{name:<22}{memory:>12.0f}{rate:>12.0f}")
+
+    records = [UserDataMapper.map_to_domain_entity(document) for document in make_documents(args.users)]
+    print(f"\nUserRecord.to_dto: {throughput(lambda record: record.to_dto(), records):.0f}/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Чтения со вторичных узлов на локальном replica set из трёх mongod.
+
+Запуск из корня репозитория (нужен mongod в PATH):
+    python -m benchmarks.bench_replica_reads --users 200 --edits 500
+
+распределение  сколько запросов get_filtered пришлось на каждый узел (serverStatus.opcounters)
+свои записи    запись в одном DBManager и чтение AuthService.get_user в следующем, как edit_me -> /auth/me:
+               с LastWriteTimes и без него; устаревшее чтение — версия ниже только что записанной
+Redis заменён InMemoryRedis: в проверке участвует только хранилище времени записей.
+"""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("MODE", "TEST")
+for _name in ("DB_HOST", "DB_USER", "DB_PASS", "DB_NAME", "REDIS_HOST"):
+    os.environ.setdefault(_name, "bench")
+for _name in ("DB_PORT", "REDIS_PORT"):
+    os.environ.setdefault(_name, "0")
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from benchmarks.standins import InMemoryRedis  # noqa: E402
+from src.init import last_write_times, redis_manager  # noqa: E402
+from src.schemas.users import UserAddDTO, UserPutAdminDTO  # noqa: E402
+from src.services.auth import AuthService  # noqa: E402
+from src.utils.db_manager import DBManager, secondary_read_preference  # noqa: E402
+
+DB_NAME = "bench"
+REPLICA_SET = "rs0"
+NODES = 3
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def replica_set() -> AsyncIterator[tuple[str, list[str]]]:
+    mongod = shutil.which("mongod")
+    if not mongod:
+        raise SystemExit("нужен mongod в PATH")
+
+    ports = [_free_port() for _ in range(NODES)]
+    hosts = [f"127.0.0.1:{port}" for port in ports]
+    with tempfile.TemporaryDirectory(prefix="bench-rs-") as root:
+        processes = []
+        for port in ports:
+            dbpath = os.path.join(root, str(port))
+            os.mkdir(dbpath)
+            processes.append(
+                subprocess.Popen(
+                    [mongod, "--replSet", REPLICA_SET, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1"],
+                    stdout=subprocess.DEVNULL,
+                )
+            )
+        try:
+            seed = AsyncIOMotorClient(hosts[0], directConnection=True)
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    await seed.admin.command("ping")
+                    break
+                except Exception:
+                    if time.monotonic() > deadline:
+                        raise
+                    await asyncio.sleep(0.2)
+            members = [{"_id": i, "host": host, "priority": 2 if i == 0 else 1} for i, host in enumerate(hosts)]
+            await seed.admin.command("replSetInitiate", {"_id": REPLICA_SET, "members": members})
+            while True:
+                status = await seed.admin.command("replSetGetStatus")
+                states = sorted(member["stateStr"] for member in status["members"])
+                if states == ["PRIMARY"] + ["SECONDARY"] * (NODES - 1):
+                    break
+                if time.monotonic() > deadline:
+                    raise SystemExit(f"replica set не поднялся: {states}")
+                await asyncio.sleep(0.2)
+            seed.close()
+            yield f"mongodb://{','.join(hosts)}/?replicaSet={REPLICA_SET}", hosts
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+
+async def query_counters(hosts: list[str]) -> dict[str, int]:
+    counters = {}
+    for host in hosts:
+        client = AsyncIOMotorClient(host, directConnection=True)
+        status = await client.admin.command("serverStatus")
+        counters[host] = status["opcounters"]["query"]
+        client.close()
+    return counters
+
+
+async def check_distribution(db_url: str, hosts: list[str], reads: int, mode: str) -> None:
+    secondary_reads = secondary_read_preference(mode, 90)
+    before = await query_counters(hosts)
+    for _ in range(reads):
+        async with DBManager(db_url, DB_NAME, secondary_reads) as db:
+            await db.users.get_filtered(role="user")
+    after = await query_counters(hosts)
+    print(f"\nget_filtered x{reads}, {mode}:")
+    for host in hosts:
+        print(f"  {host:<22}{after[host] - before[host]:>8}")
+
+
+async def check_read_your_writes(db_url: str, user_ids: list[str], edits: int, catch_up: bool) -> None:
+    secondary_reads = secondary_read_preference("secondary", 90)
+    stale = 0
+    started = time.perf_counter()
+    for i in range(edits):
+        user_id = user_ids[i % len(user_ids)]
+        async with DBManager(db_url, DB_NAME, secondary_reads) as db:
+            user = await db.users.get_one(id=user_id)
+            await db.users.edit(
+                UserPutAdminDTO(email=user.email, first_name="Bench", last_name=f"Edit{i}"), id=user_id
+            )
+            if catch_up:
+                await last_write_times.remember(user_id, db.session)
+            expected = user.version + 1
+        # следующий запрос того же пользователя — новый клиент и новая сессия
+        async with DBManager(db_url, DB_NAME, secondary_reads) as db:
+            if catch_up:
+                user = await AuthService(db).get_user(user_id)
+            else:
+                user = await db.users.reading(secondary_reads).get_one(id=user_id)
+        stale += user.version < expected
+    elapsed = time.perf_counter() - started
+    label = "с LastWriteTimes" if catch_up else "без LastWriteTimes"
+    print(f"  {label:<22}устаревших чтений {stale}/{edits}, {edits / elapsed:.0f} пар запись+чтение/с")
+
+
+async def main(args: argparse.Namespace) -> int:
+    redis_manager._redis = InMemoryRedis()  # type: ignore
+    async with replica_set() as (db_url, hosts):
+        async with DBManager(db_url, DB_NAME) as db:
+            await db.init_indexes()
+            users = await db.users.add_batch(
+                [
+                    UserAddDTO(
+                        first_name="Bench",
+                        last_name=f"User{i}",
+                        email=f"user{i}@bench.example.com",
+                        hashed_password="x",
+                        role="user",
+                    )
+                    for i in range(args.users)
+                ]
+            )
+        user_ids = [user.id for user in users]
+
+        await check_distribution(db_url, hosts, args.reads, "primary")
+        await check_distribution(db_url, hosts, args.reads, "secondaryPreferred")
+
+        print(f"\nзапись и сразу чтение со вторичного узла x{args.edits}:")
+        await check_read_your_writes(db_url, user_ids, args.edits, catch_up=False)
+        await check_read_your_writes(db_url, user_ids, args.edits, catch_up=True)
+    return 0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=300)
+    parser.add_argument("--edits", type=int, default=500)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,86 @@
+"""
+Сериализация ответа /auth/me: прежний путь против текущего, в MiB/s тела ответа.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_serialization
+
+прежний промах кэша  model_dump + json.dumps в кэш, затем jsonable_encoder + json.dumps в ответ
+прежнее попадание    json.loads из кэша, model_validate, jsonable_encoder + json.dumps в ответ
+промах кэша          один TypeAdapter.dump_json: эти же байты идут и в кэш, и в ответ
+попадание            байты из кэша отдаются как есть
+"""
+
+from typing import Callable
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from src.api.responses import CachedJSONResponse
+from src.schemas.users import UserDTO
+
+USER = UserDTO(
+    id="66b0c0ffee0000000000beef",
+    first_name="Bench",
+    last_name="User",
+    email="user@bench.example.com",
+    role="user",
+    version=3,
+)
+
+
+def legacy_miss() -> bytes:
+    json.dumps([USER.model_dump()], default=str)
+    return json.dumps(jsonable_encoder(USER), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+LEGACY_CACHED = json.dumps([USER.model_dump()], default=str)
+
+
+def legacy_hit() -> bytes:
+    user = UserDTO.model_validate(json.loads(LEGACY_CACHED)[0])
+    return json.dumps(jsonable_encoder(user), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+ADAPTER = TypeAdapter(UserDTO)
+CACHED = b'"etag"\n' + ADAPTER.dump_json(USER)
+
+
+def miss() -> bytes:
+    return CachedJSONResponse(ADAPTER.dump_json(USER)).body
+
+
+def hit() -> bytes:
+    _, _, body = CACHED.partition(b"\n")
+    return CachedJSONResponse(body).body
+
+
+def run(fn: Callable[[], bytes], iterations: int) -> tuple[float, float]:
+    size = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        size += len(fn())
+    elapsed = time.perf_counter() - started
+    return iterations / elapsed, size / elapsed / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'path':<22}{'ops/s':>12}{'MiB/s':>10}")
+    for name, fn in [
+        ("прежний промах кэша", legacy_miss),
+        ("промах кэша", miss),
+        ("прежнее попадание", legacy_hit),
+        ("попадание", hit),
+    ]:
+        ops, mib = run(fn, args.iterations)
+        print(f"{name:<22}{ops:>12.0f}{mib:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
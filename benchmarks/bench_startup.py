@@ -0,0 +1,140 @@
+"""
+Время холодного старта: импорт приложения и прогрев воркера в свежем интерпретаторе.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --save-budget    # перезаписать бюджеты
+
+импорт     медиана wall-time `import src.main` по --runs свежим процессам
+src.*      медиана суммы собственного времени импорта модулей src по -X importtime
+крупнейшие прямые импорты src.main с учётом вложенных (cumulative)
+фазы       warm_up() и сборка приложения из src.startup.startup_phases
+Бюджеты импорта берутся из benchmarks/startup_budget.json, рядом с эталоном bench_api;
+--import-budget-ms и --own-budget-ms их переопределяют. --save-budget записывает замеры
+с запасом --headroom. При превышении бюджета выходит с кодом 1, так что годится для CI.
+"""
+
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BUDGET_PATH = Path(__file__).with_name("startup_budget.json")
+
+ENV_DEFAULTS = {"MODE": "TEST", "DB_PORT": "0", "REDIS_PORT": "0"}
+for _name in ("DB_HOST", "DB_USER", "DB_PASS", "DB_NAME", "REDIS_HOST"):
+    ENV_DEFAULTS[_name] = "bench"
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import src.main
+print((time.perf_counter() - started) * 1000)
+"""
+
+WARM_UP_SCRIPT = """
+import json
+import src.main
+from src.startup import startup_phases, warm_up
+warm_up()
+print(json.dumps(startup_phases))
+"""
+
+
+def _run(script: str, *flags: str) -> subprocess.CompletedProcess:
+    env = {**ENV_DEFAULTS, **os.environ}
+    return subprocess.run(
+        [sys.executable, *flags, "-c", script], env=env, capture_output=True, text=True, check=True
+    )
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, int, str]]:
+    """Строки `import time: self | cumulative | name` -> (self_us, cumulative_us, depth, name)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def direct_imports(rows: list[tuple[int, int, int, str]], parent: str) -> list[tuple[int, str]]:
+    """(cumulative_us, name) прямых импортов parent; -X importtime печатает детей раньше родителя"""
+    children: list[tuple[int, str]] = []
+    for _, cumulative_us, depth, name in rows:
+        if depth == 1:
+            children.append((cumulative_us, name))
+        elif depth == 0:
+            if name == parent:
+                return children
+            children = []
+    return []
+
+
+def main(args: argparse.Namespace) -> int:
+    import_ms = [float(_run(IMPORT_SCRIPT).stdout.split()[-1]) for _ in range(args.runs)]
+    own_runs = [parse_importtime(_run(IMPORT_SCRIPT, "-X", "importtime").stderr) for _ in range(args.runs)]
+    own_ms = statistics.median(
+        sum(self_us for self_us, _, _, name in rows if name == "src" or name.startswith("src.")) / 1000
+        for rows in own_runs
+    )
+    rows = own_runs[-1]
+    direct = sorted(direct_imports(rows, "src.main"), reverse=True)
+    phases = json.loads(_run(WARM_UP_SCRIPT).stdout.splitlines()[-1])
+
+    print(f"импорт src.main, медиана из {args.runs}: {statistics.median(import_ms):.1f} мс")
+    print(f"собственное время модулей src, медиана из {args.runs}: {own_ms:.1f} мс")
+    print("\nкрупнейшие импорты:")
+    for cumulative_us, name in direct[: args.top]:
+        print(f"  {name:<40}{cumulative_us / 1000:>10.1f} мс")
+    print("\nфазы старта:")
+    for name, elapsed in phases.items():
+        print(f"  {name:<40}{elapsed:>10.1f} мс")
+
+    if args.save_budget:
+        budget = {
+            "import_ms": round(statistics.median(import_ms) * (1 + args.headroom), 1),
+            "own_ms": round(own_ms * (1 + args.headroom), 1),
+        }
+        args.budget.write_text(json.dumps(budget, indent=2) + "\n")
+        print(f"\nБюджеты сохранены в {args.budget}: {budget}")
+        return 0
+
+    budget = json.loads(args.budget.read_text()) if args.budget.exists() else {}
+    import_budget_ms = args.import_budget_ms or budget.get("import_ms")
+    own_budget_ms = args.own_budget_ms or budget.get("own_ms")
+    if import_budget_ms is None or own_budget_ms is None:
+        print(f"\nБюджеты не заданы и {args.budget} не найден (--save-budget чтобы создать)")
+        return 1
+
+    failed = False
+    if statistics.median(import_ms) > import_budget_ms:
+        print(f"\nимпорт дольше бюджета {import_budget_ms} мс")
+        failed = True
+    if own_ms > own_budget_ms:
+        print(f"\nмодули src импортируются дольше бюджета {own_budget_ms} мс")
+        failed = True
+    if not failed:
+        print(f"\nв бюджете: импорт {import_budget_ms} мс, модули src {own_budget_ms} мс")
+    return 1 if failed else 0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget", type=Path, default=BUDGET_PATH)
+    parser.add_argument("--import-budget-ms", type=float, default=None, help="по умолчанию из --budget")
+    parser.add_argument("--own-budget-ms", type=float, default=None, help="по умолчанию из --budget")
+    parser.add_argument("--save-budget", action="store_true", help="записать замеры с запасом как бюджеты")
+    parser.add_argument("--headroom", type=float, default=0.75, help="запас при --save-budget, доля от замера")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
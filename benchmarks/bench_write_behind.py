@@ -0,0 +1,128 @@
+"""
+Запись активности при входе: update_one в запросе против WriteBehindBuffer.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_write_behind --logins 20000 --rtt-ms 1 5 20
+
+Горячий путь входа без bcrypt: поиск пользователя по email и запись last_login_at/login_count.
+--rtt-ms задаёт время round trip записи в in-memory Mongo, то есть нагрузку на запись.
+С update_one задержка входа растёт вместе с ним, с буфером — нет: запись уходит
+пачками bulk_write из фоновой задачи. В конце проверяется, что сумма login_count
+совпадает с числом входов, и печатаются метрики буфера.
+"""
+
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from bson import ObjectId
+
+os.environ.setdefault("MODE", "TEST")
+for _name in ("DB_HOST", "DB_USER", "DB_PASS", "DB_NAME", "REDIS_HOST"):
+    os.environ.setdefault(_name, "bench")
+for _name in ("DB_PORT", "REDIS_PORT"):
+    os.environ.setdefault(_name, "0")
+
+from benchmarks.standins import InMemoryDBManager, InMemoryMongoClient  # noqa: E402
+from src.schemas.users import UserAddDTO  # noqa: E402
+from src.utils.write_behind import WriteBehindBuffer  # noqa: E402
+
+
+def activity_update() -> dict[str, dict]:
+    return {"$max": {"last_login_at": datetime.now(timezone.utc)}, "$inc": {"login_count": 1}}
+
+
+async def run(
+    db: InMemoryDBManager, emails: list[str], logins: int, concurrency: int, record: Callable[[str], Awaitable[None]]
+) -> tuple[float, float, float]:
+    latencies: list[float] = []
+    next_login = 0
+
+    async def worker() -> None:
+        nonlocal next_login
+        while next_login < logins:
+            i = next_login
+            next_login += 1
+            started = time.perf_counter()
+            user = await db.users.get_user_with_hashed_password(emails[i % len(emails)])
+            await record(user.id)
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return logins / elapsed, statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+async def total_logins(db: InMemoryDBManager) -> int:
+    return sum(doc.get("login_count", 0) for doc in db.users.collection._documents.values())
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"{'rtt ms':>7}  {'path':<10}{'logins/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'round trips':>13}")
+    for rtt_ms in args.rtt_ms:
+        for path in ("update_one", "buffer"):
+            db = InMemoryDBManager(InMemoryMongoClient(), "bench")
+            await db.init_indexes()
+            users = await db.users.add_batch(
+                [
+                    UserAddDTO(
+                        first_name="Bench",
+                        last_name=f"User{i}",
+                        email=f"user{i}@bench.example.com",
+                        hashed_password="x",
+                        role="user",
+                    )
+                    for i in range(args.users)
+                ]
+            )
+            emails = [user.email for user in users]
+            collection = db.users.collection
+            collection.write_latency = rtt_ms / 1000
+
+            buffer = WriteBehindBuffer(args.flush_size, args.flush_interval, max_backlog=args.users * 10)
+            flusher = None
+            if path == "buffer":
+                flusher = asyncio.create_task(buffer.run(collection))
+
+                async def record(user_id: str) -> None:
+                    buffer.record(user_id, activity_update())
+            else:
+
+                async def record(user_id: str) -> None:
+                    await collection.update_one({"_id": ObjectId(user_id)}, activity_update())
+
+            rps, p50, p99 = await run(db, emails, args.logins, args.concurrency, record)
+            if flusher:
+                flusher.cancel()
+                await asyncio.gather(flusher, return_exceptions=True)
+                await buffer.flush()  # как при остановке lifespan
+            round_trips = buffer.flushes if path == "buffer" else args.logins
+            print(f"{rtt_ms:>7g}  {path:<10}{rps:>10.0f}{p50:>9.3f}{p99:>9.3f}{round_trips:>13}")
+
+            written = await total_logins(db)
+            if written != args.logins:
+                raise SystemExit(f"login_count {written} != {args.logins} входов")
+            if path == "buffer":
+                print(f"{'':>9}{buffer.metrics()}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--rtt-ms", type=float, nargs="+", default=[1.0, 5.0, 20.0])
+    parser.add_argument("--flush-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.2)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
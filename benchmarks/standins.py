@@ -0,0 +1,547 @@
+from copy import deepcopy
+from itertools import count
+from typing import Any
+import asyncio
+import math
+import time
+
+from bson import ObjectId, Timestamp
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.read_preferences import Primary, _ServerMode
+from pymongo import UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from src.connectors.redis_connector import GET_WITH_TTL_SCRIPT, LOCK_SCRIPT, TOKEN_BUCKET_SCRIPT
+from src.repositories.users import UsersRepository
+from src.utils.db_manager import DBManager
+
+# логические часы кластера: каждая запись получает следующее operationTime
+_cluster_clock = count(1)
+
+
+_MISSING = object()
+
+
+def _lookup(document: dict[str, Any], path: str) -> Any:
+    if "." not in path:
+        return document.get(path, _MISSING)
+    value: Any = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _evaluate(expression: Any, document: dict[str, Any], variables: dict[str, Any]) -> Any:
+    """Выражение агрегации из $expr: поддержаны только операторы, которые используют фильтры приложения"""
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, _, path = expression[2:].partition(".")
+        value = variables[name] if not path else _lookup(variables[name], path)
+        return None if value is _MISSING else value
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _lookup(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, list):
+        return [_evaluate(item, document, variables) for item in expression]
+    if isinstance(expression, dict) and len(expression) == 1:
+        ((operator, args),) = expression.items()
+        if operator in _EXPRESSIONS:
+            return _EXPRESSIONS[operator](args, document, variables)
+    return expression
+
+
+def _scopes(args: dict[str, Any], document: dict[str, Any], variables: dict[str, Any]) -> Any:
+    """Элементы input для $map и $filter вместе с переменными, где элемент доступен как $$this"""
+    name = args.get("as", "this")
+    for item in _evaluate(args["input"], document, variables) or []:
+        yield item, variables | {name: item}
+
+
+_EXPRESSIONS: dict[str, Any] = {
+    "$gt": lambda args, doc, var: _evaluate(args[0], doc, var) > _evaluate(args[1], doc, var),
+    "$size": lambda args, doc, var: len(_evaluate(args, doc, var)),
+    "$not": lambda args, doc, var: not _evaluate(args[0], doc, var),
+    "$in": lambda args, doc, var: _evaluate(args[0], doc, var) in _evaluate(args[1], doc, var),
+    "$ifNull": lambda args, doc, var: next(
+        (value for value in (_evaluate(arg, doc, var) for arg in args) if value is not None), None
+    ),
+    "$concatArrays": lambda args, doc, var: [item for arg in args for item in _evaluate(arg, doc, var)],
+    "$objectToArray": lambda args, doc, var: [{"k": k, "v": v} for k, v in (_evaluate(args, doc, var) or {}).items()],
+    "$map": lambda args, doc, var: [_evaluate(args["in"], doc, scope) for _, scope in _scopes(args, doc, var)],
+    "$filter": lambda args, doc, var: [
+        item for item, scope in _scopes(args, doc, var) if _evaluate(args["cond"], doc, scope)
+    ],
+}
+
+
+def _matches(document: dict[str, Any], query_filter: dict[str, Any]) -> bool:
+    for field, expected in query_filter.items():
+        if field == "$or":
+            if not any(_matches(document, branch) for branch in expected):
+                return False
+            continue
+        if field == "$expr":
+            if not _evaluate(expected, document, {}):
+                return False
+            continue
+        value = _lookup(document, field)
+        if isinstance(expected, dict) and "$in" in expected:
+            if value not in expected["$in"]:
+                return False
+        elif isinstance(expected, dict) and "$ne" in expected:
+            if (None if value is _MISSING else value) == expected["$ne"]:
+                return False
+        elif isinstance(expected, dict) and "$exists" in expected:
+            if (value is not _MISSING) != bool(expected["$exists"]):
+                return False
+        elif (None if value is _MISSING else value) != expected:
+            return False
+    return True
+
+
+def _project(document: dict[str, Any], projection: dict[str, Any] | None) -> dict[str, Any]:
+    if not projection:
+        return deepcopy(document)
+    included = {field for field, flag in projection.items() if flag}
+    if projection.get("_id", 1):
+        included.add("_id")
+    return {field: deepcopy(value) for field, value in document.items() if field in included}
+
+
+class InMemoryCursor:
+    def __init__(self, documents: list[dict[str, Any]]):
+        self._documents = documents
+
+    async def to_list(self, length: int | None = None) -> list[dict[str, Any]]:
+        return self._documents if length is None else self._documents[:length]
+
+
+class InMemorySession:
+    """Causal-consistency сессия: запоминает время своих записей и принимает чужое через advance_*"""
+
+    def __init__(self) -> None:
+        self.operation_time: Timestamp | None = None
+        self.cluster_time: dict[str, Any] | None = None
+
+    def _observe_write(self) -> None:
+        self.advance_operation_time(Timestamp(int(time.time()), next(_cluster_clock)))
+        self.advance_cluster_time({"clusterTime": self.operation_time})
+
+    def advance_operation_time(self, operation_time: Timestamp) -> None:
+        if self.operation_time is None or operation_time > self.operation_time:
+            self.operation_time = operation_time
+
+    def advance_cluster_time(self, cluster_time: dict[str, Any]) -> None:
+        if self.cluster_time is None or cluster_time["clusterTime"] > self.cluster_time["clusterTime"]:
+            self.cluster_time = cluster_time
+
+    async def end_session(self) -> None:
+        pass
+
+
+class InMemoryChangeStream:
+    """Change stream поверх журнала событий InMemoryCollection, с продолжением по resume token."""
+
+    def __init__(self, collection: "InMemoryCollection", match: dict[str, Any], resume_after: Any):
+        self._collection = collection
+        self._match = match
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        start = int(resume_after["_data"], 16) + 1 if resume_after else len(collection._changes)
+        for change in collection._changes[start:]:
+            self.push(change)
+
+    def push(self, change: dict[str, Any]) -> None:
+        if _matches(change, self._match):
+            self._queue.put_nowait(deepcopy(change))
+
+    async def __aenter__(self) -> "InMemoryChangeStream":
+        self._collection._streams.add(self)
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self._collection._streams.discard(self)
+
+    def __aiter__(self) -> "InMemoryChangeStream":
+        return self
+
+    async def __anext__(self) -> dict[str, Any]:
+        return await self._queue.get()
+
+
+class InMemoryCollection:
+    """
+    Локальная замена коллекции Motor: хранит документы в словаре
+    и поддерживает только те операции, которые использует BaseRepository.
+    write_latency > 0 добавляет каждому update_one и bulk_write время сетевого round trip.
+    """
+
+    write_latency = 0.0
+
+    def __init__(self, name: str):
+        self.name = name
+        self.read_preference = None
+        self._documents: dict[ObjectId, dict[str, Any]] = {}
+        # уникальные индексы: поле -> значение -> _id
+        self._unique: dict[str, dict[Any, ObjectId]] = {}
+        # журнал изменений для watch(): номер события в журнале служит resume token
+        self._changes: list[dict[str, Any]] = []
+        self._streams: set[InMemoryChangeStream] = set()
+
+    def _record_change(
+        self,
+        operation_type: str,
+        document_id: ObjectId,
+        updated_fields: dict[str, Any] | None = None,
+        removed_fields: list[str] | None = None,
+    ) -> None:
+        change = {
+            "_id": {"_data": f"{len(self._changes):016x}"},
+            "operationType": operation_type,
+            "ns": {"coll": self.name},
+            "documentKey": {"_id": document_id},
+        }
+        if updated_fields is not None:
+            change["updateDescription"] = {"updatedFields": updated_fields, "removedFields": removed_fields or []}
+        self._changes.append(change)
+        for stream in self._streams:
+            stream.push(change)
+
+    def with_options(self, read_preference: Any = None) -> "InMemoryCollection":
+        # узел один, read preference только запоминается — документы общие с исходной коллекцией
+        view = object.__new__(InMemoryCollection)
+        view.__dict__.update(self.__dict__)
+        view.read_preference = read_preference
+        return view
+
+    def watch(self, pipeline: list[dict[str, Any]] | None = None, resume_after: Any = None) -> InMemoryChangeStream:
+        match: dict[str, Any] = {}
+        for stage in pipeline or []:
+            match |= stage.get("$match", {})
+        return InMemoryChangeStream(self, match, resume_after)
+
+    async def create_index(self, keys: str, unique: bool = False, name: str | None = None) -> str:
+        if unique and keys not in self._unique:
+            self._unique[keys] = {doc.get(keys): _id for _id, doc in self._documents.items()}
+        return name or f"{keys}_1"
+
+    def _store(self, document: dict[str, Any], previous: dict[str, Any] | None = None) -> None:
+        for field, index in self._unique.items():
+            owner = index.get(document.get(field))
+            if owner is not None and owner != document["_id"]:
+                raise DuplicateKeyError(f"E11000 duplicate key error: {field}")
+        for field, index in self._unique.items():
+            if previous is not None:
+                index.pop(previous.get(field), None)
+            index[document.get(field)] = document["_id"]
+        self._documents[document["_id"]] = document
+        if previous is None:
+            self._record_change("insert", document["_id"])
+        else:
+            updated_fields = {field: value for field, value in document.items() if previous.get(field) != value}
+            removed_fields = [field for field in previous if field not in document]
+            self._record_change("update", document["_id"], updated_fields, removed_fields)
+
+    def _remove(self, document: dict[str, Any]) -> None:
+        for field, index in self._unique.items():
+            index.pop(document.get(field), None)
+        del self._documents[document["_id"]]
+        self._record_change("delete", document["_id"])
+
+    def _find(self, query_filter: dict[str, Any] | None) -> list[dict[str, Any]]:
+        query_filter = query_filter or {}
+        candidate_id = query_filter.get("_id")
+        for field, index in self._unique.items():
+            if candidate_id is None and field in query_filter and not isinstance(query_filter[field], dict):
+                candidate_id = index.get(query_filter[field])
+                if candidate_id is None:
+                    return []
+        if isinstance(candidate_id, ObjectId):
+            document = self._documents.get(candidate_id)
+            return [document] if document and _matches(document, query_filter) else []
+        return [doc for doc in self._documents.values() if _matches(doc, query_filter)]
+
+    async def find_one(
+        self,
+        query_filter: dict[str, Any] | None = None,
+        projection: dict[str, Any] | None = None,
+        session: InMemorySession | None = None,
+    ) -> dict[str, Any] | None:
+        found = self._find(query_filter)
+        return _project(found[0], projection) if found else None
+
+    def find(
+        self,
+        query_filter: dict[str, Any] | None = None,
+        projection: dict[str, Any] | None = None,
+        session: InMemorySession | None = None,
+    ) -> InMemoryCursor:
+        return InMemoryCursor([_project(doc, projection) for doc in self._find(query_filter)])
+
+    async def insert_one(self, document: dict[str, Any], session: InMemorySession | None = None) -> InsertOneResult:
+        document.setdefault("_id", ObjectId())
+        stored = deepcopy(document)
+        self._store(stored)
+        if session is not None:
+            session._observe_write()
+        return InsertOneResult(stored["_id"], acknowledged=True)
+
+    async def insert_many(
+        self, documents: list[dict[str, Any]], ordered: bool = True, session: InMemorySession | None = None
+    ) -> InsertManyResult:
+        inserted_ids = []
+        errors = []
+        for index, document in enumerate(documents):
+            try:
+                inserted_ids.append((await self.insert_one(document, session=session)).inserted_id)
+            except DuplicateKeyError as exc:
+                errors.append({"index": index, "errmsg": str(exc)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted_ids)})
+        return InsertManyResult(inserted_ids, acknowledged=True)
+
+    def _apply_update(self, query_filter: dict[str, Any], update: dict[str, Any]) -> tuple[int, int]:
+        found = self._find(query_filter)
+        if not found:
+            return 0, 0
+        document = found[0]
+        updated = deepcopy(document)
+        updated.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            updated[field] = updated.get(field, 0) + amount
+        for field, value in update.get("$max", {}).items():
+            if field not in updated or updated[field] < value:
+                updated[field] = value
+        modified = int(updated != document)
+        if modified:
+            self._store(updated, previous=document)
+        return 1, modified
+
+    async def update_one(
+        self, query_filter: dict[str, Any], update: dict[str, Any], session: InMemorySession | None = None
+    ) -> UpdateResult:
+        if self.write_latency:
+            await asyncio.sleep(self.write_latency)
+        matched, modified = self._apply_update(query_filter, update)
+        if matched and session is not None:
+            session._observe_write()
+        return UpdateResult({"n": matched, "nModified": modified}, acknowledged=True)
+
+    async def bulk_write(
+        self, requests: list[UpdateOne], ordered: bool = True, session: InMemorySession | None = None
+    ) -> BulkWriteResult:
+        if self.write_latency:
+            await asyncio.sleep(self.write_latency)
+        matched = modified = 0
+        for request in requests:
+            request_matched, request_modified = self._apply_update(request._filter, request._doc)
+            matched += request_matched
+            modified += request_modified
+        if matched and session is not None:
+            session._observe_write()
+        return BulkWriteResult(
+            {"nInserted": 0, "nUpserted": 0, "nMatched": matched, "nModified": modified, "nRemoved": 0, "upserted": []},
+            acknowledged=True,
+        )
+
+    async def delete_one(self, query_filter: dict[str, Any], session: InMemorySession | None = None) -> DeleteResult:
+        found = self._find(query_filter)
+        if found:
+            self._remove(found[0])
+            if session is not None:
+                session._observe_write()
+        return DeleteResult({"n": len(found[:1])}, acknowledged=True)
+
+    async def delete_many(self, query_filter: dict[str, Any], session: InMemorySession | None = None) -> DeleteResult:
+        found = self._find(query_filter)
+        for document in found:
+            self._remove(document)
+        if found and session is not None:
+            session._observe_write()
+        return DeleteResult({"n": len(found)}, acknowledged=True)
+
+
+class InMemoryDatabase:
+    def __init__(self, client: "InMemoryMongoClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: dict[str, InMemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name)
+        return self._collections[name]
+
+
+class InMemoryMongoClient:
+    HOST = "memory"
+    PORT = 0
+
+    def __init__(self) -> None:
+        self._databases: dict[str, InMemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> InMemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = InMemoryDatabase(self, name)
+        return self._databases[name]
+
+    async def start_session(self, causal_consistency: bool = True) -> InMemorySession:
+        return InMemorySession()
+
+    def close(self) -> None:
+        # Клиент общий для всех запросов бенчмарка — закрывать нечего
+        pass
+
+
+class InMemoryDBManager(DBManager):
+    """DBManager поверх общего InMemoryMongoClient вместо Motor."""
+
+    def __init__(self, client: InMemoryMongoClient, db_name: str, secondary_reads: _ServerMode | None = None):
+        self._owns_client = False
+        self.client = client  # type: ignore
+        self.db = client[db_name]  # type: ignore
+        self.secondary_reads = secondary_reads or Primary()
+        self.session = None
+
+        self.users = UsersRepository(self.db, self.secondary_reads)  # type: ignore
+
+    @property
+    def secondaries_available(self) -> bool:
+        # у стенда нет топологии: «вторичные» чтения идут в ту же память
+        return self.reads_from_secondaries
+
+
+class InMemoryRedis:
+    """
+    Локальная замена redis.asyncio.Redis для RedisManager.
+    Lua-скрипты RedisManager повторены на Python и выбираются по тексту скрипта.
+    latency > 0 задерживает каждую команду — так имитируется зависший Redis.
+    """
+
+    latency = 0.0
+
+    async def _delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def __init__(self) -> None:
+        self._data: dict[str, tuple[bytes, float | None]] = {}
+        self._hashes: dict[str, dict[str, float]] = {}
+        self._channels: dict[str, set[asyncio.Queue[bytes]]] = {}
+        self._script_impls = {
+            TOKEN_BUCKET_SCRIPT: self._token_bucket,
+            LOCK_SCRIPT: self._lock,
+            GET_WITH_TTL_SCRIPT: self._get_with_ttl,
+        }
+
+    def register_script(self, source: str):
+        impl = self._script_impls[source]
+
+        async def run(keys: list[str], args: list[Any]) -> Any:
+            await self._delay()
+            return impl(keys, args)
+
+        return run
+
+    def _token_bucket(self, keys: list[str], args: list[Any]) -> list[int]:
+        now = time.monotonic() * 1000
+        tokens, waits = [], []
+        for i, key in enumerate(keys):
+            capacity, rate = float(args[2 * i]), float(args[2 * i + 1]) / 1000
+            state = self._hashes.get(key, {"tokens": capacity, "ts": now})
+            available = min(capacity, state["tokens"] + max(0.0, now - state["ts"]) * rate)
+            tokens.append(available)
+            waits.append(0 if available >= 1 else math.ceil((1 - available) / rate))
+        allowed = not any(waits)
+        for key, available in zip(keys, tokens):
+            self._hashes[key] = {"tokens": available - 1 if allowed else available, "ts": now}
+        return waits
+
+    def _lock(self, keys: list[str], args: list[Any]) -> int:
+        owner = str(args[0]).encode()
+        current = self._data.get(keys[0])
+        if current and current[0] != owner and (current[1] is None or current[1] > time.monotonic()):
+            return 0
+        self._data[keys[0]] = (owner, time.monotonic() + int(args[1]) / 1000)
+        return 1
+
+    def _get_with_ttl(self, keys: list[str], args: list[Any]) -> list[Any] | None:
+        item = self._data.get(keys[0])
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is None:
+            return [value, -1]
+        ttl_ms = math.ceil((expires_at - time.monotonic()) * 1000)
+        if ttl_ms <= 0:
+            del self._data[keys[0]]
+            return None
+        return [value, ttl_ms]
+
+    def pubsub(self) -> "InMemoryPubSub":
+        return InMemoryPubSub(self)
+
+    async def publish(self, channel: str, message: str | bytes) -> int:
+        await self._delay()
+        if isinstance(message, str):
+            message = message.encode()
+        subscribers = self._channels.get(channel, set())
+        for queue in subscribers:
+            queue.put_nowait(message)
+        return len(subscribers)
+
+    async def set(self, key: str, value: str | bytes, ex: int | None = None) -> bool:
+        await self._delay()
+        if isinstance(value, str):
+            value = value.encode()
+        expires_at = time.monotonic() + ex if ex else None
+        self._data[key] = (value, expires_at)
+        return True
+
+    async def get(self, key: str) -> bytes | None:
+        await self._delay()
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def delete(self, *keys: str) -> int:
+        await self._delay()
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def flushall(self) -> bool:
+        self._data.clear()
+        self._hashes.clear()
+        return True
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryPubSub:
+    def __init__(self, redis: InMemoryRedis) -> None:
+        self._redis = redis
+        self._queue: asyncio.Queue[bytes] = asyncio.Queue()
+        self._channels: list[str] = []
+
+    async def subscribe(self, channel: str) -> None:
+        self._redis._channels.setdefault(channel, set()).add(self._queue)
+        self._channels.append(channel)
+
+    async def unsubscribe(self, channel: str) -> None:
+        self._redis._channels.get(channel, set()).discard(self._queue)
+        self._channels.remove(channel)
+
+    async def listen(self):
+        while True:
+            yield {"type": "message", "data": await self._queue.get()}
+
+    async def aclose(self) -> None:
+        for channel in list(self._channels):
+            await self.unsubscribe(channel)
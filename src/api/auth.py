@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Request, Response
 
 from src.abac import access_manager
-from src.api.decorators import cache
+from src.api.decorators import cache, version_etag
 from src.api.dependencies import DBDep, EditUserPermissionDep, UserIdDep
 from src.exceptions import (
     InvalidJWTException,
     InvalidJWTHTTPException,
     PasswordTooShortException,
     PasswordTooShortHTTPException,
+    TooManyLoginAttemptsException,
+    TooManyLoginAttemptsHTTPException,
     UserAlreadyExistsException,
     UserAlreadyExistsHTTPException,
     UserAlreadyLoggedInException,
@@ -19,7 +21,15 @@ from src.exceptions import (
     WrongPasswordException,
     WrongPasswordHTTPException,
 )
-from src.schemas.users import UserLoginDTO, UserRegisterDTO, UserPutDTO, UserPutAdminDTO
+from src.schemas.responses import AccessTokenDTO, StatusDTO
+from src.schemas.users import (
+    UserDTO,
+    UserLoginDTO,
+    UserRegisterDTO,
+    UserPutDTO,
+    UserPutAdminDTO,
+)
+from src.init import invalidation_bus
 from src.services.auth import AuthService
 
 router = APIRouter(prefix="/auth", tags=["Авторизация и аутентификация"])
@@ -29,10 +39,10 @@ router = APIRouter(prefix="/auth", tags=["Авторизация и аутент
 async def register_user(
     db: DBDep,
     user_data: UserRegisterDTO,
-) -> dict[str, str]:
+) -> StatusDTO:
     try:
         await AuthService(db).register_user(user_data)
-        return {"status": "OK"}
+        return StatusDTO()
     except PasswordTooShortException:
         raise PasswordTooShortHTTPException
     except UserAlreadyExistsException:
@@ -45,13 +55,15 @@ async def login_user(
     user_data: UserLoginDTO,
     request: Request,
     response: Response,
-) -> dict[str, str]:
+) -> AccessTokenDTO:
     try:
         access_token = await AuthService(db).login_user(request, user_data)
         response.set_cookie("access_token", access_token)
-        return {"access_token": access_token}
+        return AccessTokenDTO(access_token=access_token)
     except InvalidJWTException:
         raise InvalidJWTHTTPException
+    except TooManyLoginAttemptsException as exc:
+        raise TooManyLoginAttemptsHTTPException(headers={"Retry-After": str(exc.retry_after)})
     except UserAlreadyLoggedInException:
         raise UserAlreadyLoggedInHTTPException
     except UserNotFoundException:
@@ -65,10 +77,10 @@ async def edit_me(
     db: DBDep,
     user_id: UserIdDep,
     user_data: UserPutDTO,
-) -> dict[str, str]:
+) -> StatusDTO:
     try:
         await AuthService(db).edit_user(user_id, user_data)
-        return {"status": "OK"}
+        return StatusDTO()
     except UserNotFoundException:
         raise UserNotFoundHTTPException
     except UserAlreadyExistsException:
@@ -83,14 +95,14 @@ async def edit_user(
     db: DBDep,
     user_id: UserIdDep,
     user_data: UserPutAdminDTO,
-) -> dict[str, str]:
+) -> StatusDTO:
     subject_role = await AuthService(db).get_user_role(user_id)
     subject = {"id": user_id, "role": subject_role}
     if not access_manager.check("user:edit", subject):
         raise PermissionError
     try:
         await AuthService(db).admin_edit_user(user_edit_email, user_data)
-        return {"status": "OK"}
+        return StatusDTO()
     except UserNotFoundException:
         raise UserNotFoundHTTPException
     except UserAlreadyExistsException:
@@ -98,18 +110,35 @@ async def edit_user(
 
 
 @router.post("/logout", summary="Выход из системы")
-async def logout_user(request: Request, response: Response):
+async def logout_user(request: Request, response: Response) -> StatusDTO:
     try:
         await AuthService().logout_user(request, response)
     except UserAlreadyLoggedOutException:
         raise UserAlreadyLoggedOutHTTPException
-    return {"status": "OK"}
+    return StatusDTO()
 
 
 @router.get("/me", summary="☻ Мой профиль")
-@cache(expire=10)
-async def get_me(db: DBDep, user_id: UserIdDep):
+@cache(expire=10, etag=version_etag)
+async def get_me(db: DBDep, user_id: UserIdDep) -> UserDTO:
     try:
-        return await AuthService(db).get_user(user_id)
+        return (await AuthService(db).get_user(user_id)).to_dto()
     except UserNotFoundException:
         raise UserNotFoundHTTPException
+
+
+def _invalidate_local_me(user_id: str | None) -> None:
+    if user_id is None:
+        get_me.invalidate_local()
+    else:
+        get_me.invalidate_local(user_id=user_id)
+
+
+async def _invalidate_shared_me(user_id: str | None) -> None:
+    # без user_id ключи Redis не перебираем: они истекут по TTL
+    if user_id is not None:
+        await get_me.invalidate(user_id=user_id)
+
+
+invalidation_bus.subscribe(_invalidate_local_me)
+invalidation_bus.subscribe_shared(_invalidate_shared_me)
@@ -1,84 +1,164 @@
+from contextlib import nullcontext
 from functools import wraps
-from typing import Any, Awaitable, Callable, TypeVar, get_origin, get_args
+from typing import Any, Awaitable, Callable, TypeVar
 import hashlib
 import inspect
 import json
 
-from pydantic import BaseModel
+from fastapi import Request, Response
+from pydantic import TypeAdapter
 
+from src.api.responses import CachedJSONResponse, dumps
+from src.config import settings
+from src.exceptions import RedisUnavailableException
 from src.init import redis_manager
+from src.utils.local_cache import LocalCache
 
 F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
 
+# параметр, который декоратор добавляет в сигнатуру для FastAPI и убирает перед вызовом функции
+_REQUEST_PARAM = "_cache_request"
 
-def cache(expire: int = 60) -> Any:
+
+def version_etag(result: Any) -> str | None:
+    """ETag из id и версии документа, которую поддерживает BaseRepository.edit"""
+    version = getattr(result, "version", None)
+    if version is None:
+        return None
+    return f'"{result.id}-{version}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _is_primitive(v: Any) -> bool:
+    return (
+        isinstance(v, (str, int, float, bool, type(None)))
+        or (isinstance(v, (list, tuple)) and all(_is_primitive(i) for i in v))
+        or (isinstance(v, dict) and all(isinstance(k, str) and _is_primitive(v[k]) for k in v))
+    )
+
+
+def cache(expire: int = 60, etag: Callable[[Any], str | None] | None = None) -> Any:
+    """
+    Кэширует ответ в Redis и в памяти воркера на expire секунд.
+    Сбои Redis не ломают запрос: обёртка работает с локальной копией и обработчиком.
+    Обёртка получает invalidate(**аргументы) для сброса записи в памяти воркера и в Redis
+    и invalidate_local(**аргументы) — только в памяти, для подписчиков InvalidationBus.
+    В кэше хранится готовое JSON-тело ответа, попадание в кэш отдаёт его байты как есть.
+    Если передан etag, ETag хранится рядом с телом: запрос с совпавшим If-None-Match
+    получает 304 прямо из кэша, без вызова функции и разбора тела.
+    """
     signature = None
 
     def decorator(func: Any) -> Any:
         nonlocal signature
         signature = inspect.signature(func)
-
-        @wraps(func)
-        async def wrapper(*args: Any, **kwargs: Any) -> Any:
-            # 1) Собираем аргументы
-            bound = signature.bind_partial(*args, **kwargs)
-            bound.apply_defaults()
-            args_dict = bound.arguments
-
-            # 2) Фильтруем «зависимости» и все не-примитивы
-            def is_primitive(v: Any) -> bool:
-                return (
-                    isinstance(v, (str, int, float, bool, type(None)))
-                    or (isinstance(v, (list, tuple)) and all(is_primitive(i) for i in v))
-                    or (
-                        isinstance(v, dict)
-                        and all(isinstance(k, str) and is_primitive(v[k]) for k in v)
-                    )
-                )
-
-            filtered_args = {}
-            for name, val in args_dict.items():
-                # оставляем только примитивы
-                if is_primitive(val):
-                    filtered_args[name] = val
-
-            # 3) Генерируем ключ из отфильтрованных аргументов
+        # по аннотации возврата тело сериализуется так же, как его отдал бы FastAPI
+        ret_ann = signature.return_annotation
+        adapter = TypeAdapter(ret_ann) if ret_ann is not inspect.Signature.empty else None
+        # копия записей в памяти воркера, перед Redis
+        local = LocalCache(settings.LOCAL_CACHE_SIZE, expire)
+
+        def make_key(arguments: dict[str, Any]) -> str:
+            filtered_args = {name: val for name, val in arguments.items() if _is_primitive(val)}
             key_raw = (
                 f"{func.__module__}.{func.__name__}|"
                 f"{json.dumps(filtered_args, default=str, sort_keys=True)}"
             )
-            key = hashlib.sha256(key_raw.encode()).hexdigest()
+            return hashlib.sha256(key_raw.encode()).hexdigest()
 
-            # 4) Пытаемся взять из Redis
-            cached = await redis_manager.get(key)
-            if cached:
-                payload = json.loads(cached)
-                ret_ann = signature.return_annotation
-                origin = get_origin(ret_ann)
-                # список моделей
-                if origin is list:
-                    model_type = get_args(ret_ann)[0]
-                    return [model_type.parse_obj(item) for item in payload]
-                # одиночная модель
-                if inspect.isclass(ret_ann) and issubclass(ret_ann, BaseModel):
-                    return ret_ann.model_validate(payload[0])
-                # всё остальное
-                return payload
-
-            # 5) Если нет — вызываем оригинал, сохраняем и возвращаем
-            result = await func(*args, **kwargs)
-
-            # сериализуем результат
-            if isinstance(result, list):
-                out = [
-                    item.model_dump() if isinstance(item, BaseModel) else item for item in result
-                ]
+        def invalidate_local(**arguments: Any) -> None:
+            """Удаляет запись только из памяти воркера, без аргументов — все записи"""
+            if arguments:
+                local.delete(make_key(arguments))
             else:
-                out = [result.model_dump() if isinstance(result, BaseModel) else result]
+                local.clear()
+
+        async def invalidate(**arguments: Any) -> None:
+            """
+            Удаляет запись для переданных примитивных аргументов из памяти воркера и из Redis.
+            Без аргументов сбрасывает только локальную копию: ключи Redis истекут по TTL.
+            """
+            invalidate_local(**arguments)
+            if not arguments:
+                return
+            key = make_key(arguments)
+            try:
+                await redis_manager.delete(key)
+            except RedisUnavailableException:
+                pass
+
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            request: Request = kwargs.pop(_REQUEST_PARAM)
+            if_none_match = request.headers.get("if-none-match")
 
-            await redis_manager.set(key, json.dumps(out, default=str), expire)
-            return result
+            # 1) Собираем аргументы
+            bound = signature.bind_partial(*args, **kwargs)
+            bound.apply_defaults()
 
+            # 2-3) Ключ из примитивных аргументов, «зависимости» отбрасываются
+            key = make_key(bound.arguments)
+
+            # 4) Пытаемся взять из памяти воркера, затем из Redis: в кэше лежит готовое
+            #    тело ответа, отдаём его как есть, без json.loads и повторной сериализации
+            cached = local.get(key)
+            redis_failed = False
+            if cached is None:
+                try:
+                    found = await redis_manager.get_with_ttl(key)
+                except RedisUnavailableException:
+                    # Redis недоступен — идём сразу в обработчик, ожидание ограничено таймаутом
+                    found = None
+                    redis_failed = True
+                if found:
+                    cached, ttl_ms = found
+                    # локальная копия живёт не дольше записи в Redis, иначе устарела бы до 2×expire
+                    if ttl_ms > 0:
+                        local.set(key, cached, ttl_ms / 1000)
+                    elif ttl_ms == -1:
+                        local.set(key, cached, expire)
+            if cached:
+                # формат записи: b"<etag>\n<json>", etag может быть пустым
+                cached_etag, _, body = cached.partition(b"\n")
+                headers = {"ETag": cached_etag.decode()} if cached_etag else None
+                if headers and _etag_matches(if_none_match, headers["ETag"]):
+                    return Response(status_code=304, headers=headers)
+                return CachedJSONResponse(body, headers=headers)
+
+            # 5) Если нет — вызываем оригинал, сериализуем один раз, сохраняем и отдаём те же байты
+            # Redis уже не ответил по таймауту: ни обработчик, ни запись в кэш второй таймаут не ждут,
+            # запись останется только в памяти воркера
+            with redis_manager.bypassed() if redis_failed else nullcontext():
+                result = await func(*args, **kwargs)
+            body = adapter.dump_json(result) if adapter else dumps(result)
+
+            result_etag = etag(result) if etag else None
+            entry = f"{result_etag or ''}\n".encode() + body
+            local.set(key, entry, expire)
+            if not redis_failed:
+                try:
+                    await redis_manager.set(key, entry, expire)
+                except RedisUnavailableException:
+                    pass
+            headers = {"ETag": result_etag} if result_etag else None
+            if headers and _etag_matches(if_none_match, result_etag):
+                return Response(status_code=304, headers=headers)
+            return CachedJSONResponse(body, headers=headers)
+
+        wrapper.invalidate = invalidate  # type: ignore
+        wrapper.invalidate_local = invalidate_local  # type: ignore
+        wrapper.__signature__ = signature.replace(  # type: ignore
+            parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(_REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            ]
+        )
         return wrapper  # type: ignore
 
     return decorator
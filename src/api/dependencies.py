@@ -5,12 +5,21 @@ from fastapi import Depends, Request
 from src.abac import access_manager
 from src.config import settings
 from src.exceptions import JWTMissingException, JWTMissingHTTPException
+from src.init import invalidation_bus, mongo_manager
 from src.services.auth import AuthService
-from src.utils.db_manager import DBManager
+from src.utils.db_manager import DBManager, secondary_read_preference
+from src.utils.local_cache import LocalCache
 
 
 def get_db_manager():
-    return DBManager(db_url=settings.DB_URL, db_name=settings.DB_NAME)
+    return DBManager(
+        db_url=settings.DB_URL,
+        db_name=settings.DB_NAME,
+        secondary_reads=secondary_read_preference(
+            settings.DB_SECONDARY_READ_PREFERENCE, settings.DB_MAX_STALENESS_SECONDS
+        ),
+        client=mongo_manager.client,
+    )
 
 
 async def get_db():
@@ -36,22 +45,32 @@ async def get_current_user_id(token: str = Depends(get_token)) -> int:
 UserIdDep = Annotated[int, Depends(get_current_user_id)]
 
 
-async def _get_subject(request: Request) -> dict[str, any]:
+# субъекты ABAC по user_id; сбрасываются через InvalidationBus: в записавшем воркере сразу
+# из notify(), в остальных по событию Redis — change stream для этого не нужен
+subject_cache = LocalCache(settings.LOCAL_CACHE_SIZE, settings.SUBJECT_CACHE_TTL)
+invalidation_bus.subscribe(subject_cache.invalidate)
+
+
+async def _get_subject(request: Request, db: DBManager) -> dict[str, any]:
     token = await get_token(request)
     data = AuthService().decode_token(token)
-    user = await AuthService().get_user(data["user_id"])
-    return {"id": user.id, "role": user.role}
+    subject = subject_cache.get(data["user_id"])
+    if subject is None:
+        user = await AuthService(db).get_user(data["user_id"])
+        subject = {"id": user.id, "role": user.role}
+        subject_cache.set(user.id, subject)
+    return subject
 
 
 def abac_required(action, resource_getter: Callable[[Request], dict[str, any]] | None = None):
-    async def is_permitted(request: Request) -> bool:
-        subject = await _get_subject(request)
+    async def is_permitted(request: Request, db: DBDep) -> bool:
+        subject = await _get_subject(request, db)
         resource = resource_getter(request) if resource_getter else {}
         if not access_manager.check(action, subject, resource):
             raise PermissionError
         return True
 
-    return Annotated[bool, Depends(is_permitted)]
+    return Depends(is_permitted)
 
 
 EditUserPermissionDep = abac_required("user:edit")
@@ -0,0 +1,31 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import orjson
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    # молча превращать неизвестное в str значит отдать клиенту repr вместо данных
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def dumps(content: Any) -> bytes:
+    """Сериализация в JSON через orjson; pydantic-модели — через _default, неизвестные типы — TypeError"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class AppJSONResponse(JSONResponse):
+    """Ответ по умолчанию для всего приложения: orjson вместо stdlib json"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class CachedJSONResponse(AppJSONResponse):
+    """Ответ из уже сериализованного тела (например, из кэша) — без повторной сериализации"""
+
+    def render(self, content: bytes) -> bytes:
+        return content
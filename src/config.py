@@ -1,8 +1,18 @@
 from typing import Literal
+import os
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+def available_cpus() -> int:
+    """Ядра, на которых процессу разрешено работать (taskset, cpuset контейнера), а не все ядра машины"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity есть не везде, например в macOS
+        return os.cpu_count() or 1
+
+
 class Settings(BaseSettings):
     MODE: Literal["TEST", "LOCAL", "DEV", "PROD"]
     DB_HOST: str
@@ -10,14 +20,85 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASS: str
     DB_NAME: str
+    # массовые чтения и /auth/me со вторичных узлов replica set; отставание узла
+    # не больше DB_MAX_STALENESS_SECONDS (Mongo допускает не меньше 90)
+    DB_SECONDARY_READ_PREFERENCE: Literal[
+        "primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"
+    ] = "secondaryPreferred"
+    DB_MAX_STALENESS_SECONDS: int = 90
+    # лимит соединений с Mongo на все воркеры вместе; пул каждого воркера — DB_POOL_SIZE
+    # (сверх пула драйвер держит по 1-2 служебных соединения на узел)
+    DB_MAX_CONNECTIONS: int = 100
 
     REDIS_HOST: str
     REDIS_PORT: int
+    # таймаут одной операции Redis и размыкатель: после REDIS_BREAKER_FAILURES ошибок подряд
+    # кэш обходится, пробный запрос — раз в REDIS_BREAKER_RESET_SECONDS
+    REDIS_OP_TIMEOUT_MS: int = 50
+    REDIS_BREAKER_FAILURES: int = 5
+    REDIS_BREAKER_RESET_SECONDS: float = 5.0
+    # лимит соединений с Redis на все воркеры вместе, включая подписку pub/sub
+    REDIS_MAX_CONNECTIONS: int = 100
+
+    # пре-форк запуск (python -m src.server): WEB_WORKERS=0 — по числу ядер.
+    # Воркер перезапускается после WORKER_MAX_REQUESTS (+ случайно до _JITTER, чтобы
+    # воркеры не уходили разом) запросов или при RSS выше WORKER_MAX_MEMORY_MB; 0 — без лимита
+    WEB_WORKERS: int = 0
+    WORKER_MAX_REQUESTS: int = 0
+    WORKER_MAX_REQUESTS_JITTER: int = 0
+    WORKER_MAX_MEMORY_MB: int = 0
+    WORKER_GRACEFUL_TIMEOUT: int = 30
 
     JWT_SECRET_KEY: str = ""
     JWT_ALGORITHM: str = ""
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 0
 
+    # хэширование паролей; при PASSWORD_HASH_TARGET_MS > 0 мастер python -m src.server подбирает
+    # стоимость под целевую задержку до запуска воркеров, а значения ниже служат нижней границей.
+    # Отдельно запущенные процессы (uvicorn src.main:app) не калибруются и берут значения как есть
+    PASSWORD_HASH_SCHEME: Literal["bcrypt", "argon2"] = "bcrypt"
+    PASSWORD_HASH_TARGET_MS: int = 0
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
+
+    # локальные кэши воркеров и их инвалидация через change stream + Redis pub/sub
+    LOCAL_CACHE_SIZE: int = 10_000
+    SUBJECT_CACHE_TTL: int = 60
+    CHANGE_STREAM_ENABLED: bool = True
+
+    # отложенная запись активности пользователей (время входа, счётчик входов):
+    # сброс по числу документов или по времени, сверх ACTIVITY_MAX_BACKLOG обновления теряются
+    ACTIVITY_FLUSH_SIZE: int = 500
+    ACTIVITY_FLUSH_INTERVAL: float = 1.0
+    ACTIVITY_MAX_BACKLOG: int = 100_000
+    # после стольких отказов Mongo (BulkWriteError) обновление документа отбрасывается
+    ACTIVITY_MAX_ATTEMPTS: int = 5
+    # как часто фоновая задача пишет метрики буфера в лог, 0 — только при остановке
+    ACTIVITY_METRICS_INTERVAL: float = 60.0
+
+    # token bucket на /auth/login: ёмкость и пополнение в токенах в секунду
+    LOGIN_RATE_IP_CAPACITY: int = 20
+    LOGIN_RATE_IP_REFILL: float = 0.5
+    LOGIN_RATE_EMAIL_CAPACITY: int = 5
+    LOGIN_RATE_EMAIL_REFILL: float = 0.1
+    # заблокированные ключи и запасные корзины без Redis в памяти воркера
+    LOGIN_BLOCKED_CACHE_SIZE: int = 10_000
+
+    @property
+    def WORKERS(self) -> int:
+        return self.WEB_WORKERS or available_cpus()
+
+    @property
+    def DB_POOL_SIZE(self) -> int:
+        return max(1, self.DB_MAX_CONNECTIONS // self.WORKERS)
+
+    @property
+    def REDIS_POOL_SIZE(self) -> int:
+        # соединения для команд; ещё одно на воркер держит подписка InvalidationBus
+        return max(1, self.REDIS_MAX_CONNECTIONS // self.WORKERS - 1)
+
     @property
     def REDIS_URL(self):
         return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}"
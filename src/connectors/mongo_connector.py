@@ -0,0 +1,26 @@
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+class MongoManager:
+    """
+    Один AsyncIOMotorClient на воркер: все запросы берут соединения из общего пула
+    размером не больше max_pool_size. Клиент создаётся в connect() уже внутри воркера —
+    клиенты pymongo нельзя переносить через fork.
+    """
+
+    client: AsyncIOMotorClient | None = None
+
+    def __init__(self, url: str, max_pool_size: int):
+        self.url = url
+        self.max_pool_size = max_pool_size
+
+    async def connect(self):
+        logging.info(f"Создаю клиент Mongo, пул до {self.max_pool_size} соединений")
+        self.client = AsyncIOMotorClient(self.url, maxPoolSize=self.max_pool_size)
+
+    async def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
@@ -1,33 +1,203 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+import asyncio
 import logging
 
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
 import redis.asyncio as redis
 
+from src.exceptions import RedisUnavailableException
+from src.utils.circuit_breaker import CircuitBreaker
+
+# Несколько token bucket'ов за один вызов: KEYS — ключи корзин,
+# ARGV — пары (ёмкость, пополнение в токенах/сек) на каждый ключ.
+# Токен списывается только если он есть во всех корзинах сразу.
+# Возвращает для каждой корзины сколько миллисекунд ждать до следующего токена (0 — токен есть).
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local tokens = {}
+local waits = {}
+local allowed = true
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i]) / 1000
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    tokens[i] = available
+    waits[i] = 0
+    if available < 1 then
+        waits[i] = math.ceil((1 - available) / rate)
+        allowed = false
+    end
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i]) / 1000
+    if allowed then
+        tokens[i] = tokens[i] - 1
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens[i]), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil((capacity - tokens[i]) / rate) + 1000)
+end
+return waits
+"""
+
+# Захват или продление блокировки: если ключ уже наш (ARGV[1]) — продлеваем TTL,
+# иначе пытаемся занять свободный. Возвращает 1, если блокировка за нами.
+LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# Значение ключа вместе с оставшимся TTL в миллисекундах (-1 — без TTL) за один round trip;
+# nil, если ключа нет.
+GET_WITH_TTL_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if not value then
+    return nil
+end
+return {value, redis.call('PTTL', KEYS[1])}
+"""
+
 
 class RedisManager:
+    """
+    Все операции ограничены op_timeout и идут через CircuitBreaker:
+    при сбоях Redis бросается RedisUnavailableException за время не больше таймаута,
+    а пока цепь разомкнута или внутри bypassed() — сразу, без обращения к Redis.
+    """
+
     _redis: redis.Redis
 
-    def __init__(self, host: str, port: int):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        op_timeout: float = 0.05,
+        breaker: CircuitBreaker | None = None,
+        max_connections: int | None = None,
+    ):
         self.host = host
         self.port = port
+        self.max_connections = max_connections
+        self.op_timeout = op_timeout
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=5.0)
+        self._scripts: dict[str, AsyncScript] = {}
+        self._bypassed: ContextVar[bool] = ContextVar(f"redis_bypassed_{id(self)}", default=False)
+
+    @contextmanager
+    def bypassed(self) -> Iterator[None]:
+        """
+        Команды внутри блока (и в корутинах, которые он ждёт) сразу бросают RedisUnavailableException.
+        Для запроса, в котором Redis уже не ответил по таймауту: пока цепь ещё замкнута,
+        каждая следующая команда ждала бы свой таймаут.
+        """
+        token = self._bypassed.set(True)
+        try:
+            yield
+        finally:
+            self._bypassed.reset(token)
 
     async def connect(self):
         logging.info(f"Начинаю подключение к Redis host={self.host}, port={self.port}")
-        self._redis = await redis.Redis(host=self.host, port=self.port)
+        if self.max_connections:
+            # при исчерпанном пуле команда ждёт соединение (в пределах op_timeout), а не падает сразу
+            pool = redis.BlockingConnectionPool(host=self.host, port=self.port, max_connections=self.max_connections)
+            self._redis = await redis.Redis.from_pool(pool)
+        else:
+            self._redis = await redis.Redis(host=self.host, port=self.port)
+        self._scripts.clear()
+        try:
+            await self._call("ping", self._redis.ping)
+        except RedisUnavailableException:
+            # приложение стартует и без Redis: кэш обходится, пока цепь не замкнётся
+            logging.warning(f"Redis недоступен host={self.host}, port={self.port}, работаю без кэша")
+            return
         logging.info(f"Успешное подключение к Redis host={self.host}, port={self.port}")
 
-    async def set(self, key: str, value: str, expire: int | None = None):
+    async def _call(self, operation: str, method: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        if self._bypassed.get() or not self.breaker.allow():
+            raise RedisUnavailableException
+        try:
+            result = await asyncio.wait_for(method(*args, **kwargs), self.op_timeout)
+        except (RedisError, OSError, asyncio.TimeoutError) as exc:
+            self.breaker.record_failure()
+            logging.warning(f"Redis {operation} не выполнен: {exc!r}")
+            raise RedisUnavailableException from exc
+        self.breaker.record_success()
+        return result
+
+    def _script(self, source: str) -> AsyncScript:
+        # register_script сам делает EVALSHA с откатом на SCRIPT LOAD — один round trip
+        if source not in self._scripts:
+            self._scripts[source] = self._redis.register_script(source)
+        return self._scripts[source]
+
+    async def set(self, key: str, value: str | bytes, expire: int | None = None):
         logging.info(f"Установка значения по ключу: {key}")
         if expire:
-            await self._redis.set(key, value, ex=expire)
+            await self._call("set", self._redis.set, key, value, ex=expire)
         else:
-            await self._redis.set(key, value)
+            await self._call("set", self._redis.set, key, value)
 
     async def get(self, key: str):
         logging.info(f"Получение значения по ключу: {key}")
-        return await self._redis.get(key)
+        return await self._call("get", self._redis.get, key)
+
+    async def get_with_ttl(self, key: str) -> tuple[bytes, int] | None:
+        """(значение, оставшийся TTL в мс) или None; TTL -1 — ключ без срока"""
+        logging.info(f"Получение значения и TTL по ключу: {key}")
+        result = await self._call("get_with_ttl", self._script(GET_WITH_TTL_SCRIPT), keys=[key], args=[])
+        if not result:
+            return None
+        value, ttl_ms = result
+        return value, int(ttl_ms)
 
     async def delete(self, key: str):
-        await self._redis.delete(key)
+        await self._call("delete", self._redis.delete, key)
+
+    async def take_tokens(self, buckets: list[tuple[str, int, float]]) -> list[int]:
+        """
+        Атомарно списывает по токену из всех корзин buckets = [(ключ, ёмкость, пополнение/сек)].
+        Возвращает по каждой корзине миллисекунды ожидания; все нули — токен списан.
+        """
+        keys = [key for key, _, _ in buckets]
+        args = [value for _, capacity, rate in buckets for value in (capacity, rate)]
+        waits = await self._call("take_tokens", self._script(TOKEN_BUCKET_SCRIPT), keys=keys, args=args)
+        return [int(wait) for wait in waits]
+
+    async def acquire_lock(self, key: str, owner: str, ttl_ms: int) -> bool:
+        """Занимает или продлевает блокировку key за owner на ttl_ms"""
+        return bool(await self._call("acquire_lock", self._script(LOCK_SCRIPT), keys=[key], args=[owner, ttl_ms]))
+
+    async def publish(self, channel: str, message: str | bytes):
+        await self._call("publish", self._redis.publish, channel, message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        """
+        Сообщения канала channel по мере поступления.
+        Подписка долгоживущая, поэтому идёт мимо таймаута и размыкателя.
+        """
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(channel)
+        logging.info(f"Подписка на канал Redis: {channel}")
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
 
     async def close(self):
         if self._redis:
@@ -20,6 +20,18 @@ class PasswordTooShortException(BibliotecaException):
     detail = "Пароль слишком короткий"
 
 
+class RedisUnavailableException(BibliotecaException):
+    detail = "Redis недоступен"
+
+
+class TooManyLoginAttemptsException(BibliotecaException):
+    detail = "Слишком много попыток входа, попробуйте позже"
+
+    def __init__(self, retry_after: int = 1, *args, **kwargs):
+        self.retry_after = retry_after
+        super().__init__(*args, **kwargs)
+
+
 class UserAlreadyLoggedInException(BibliotecaException):
     detail = "Вы уже аутентифицированы"
 
@@ -80,6 +92,11 @@ class PasswordTooShortHTTPException(BibliotecaHTTPException):
     detail = "Пароль слишком короткий"
 
 
+class TooManyLoginAttemptsHTTPException(BibliotecaHTTPException):
+    status_code = 429
+    detail = "Слишком много попыток входа, попробуйте позже"
+
+
 class UserAlreadyExistsHTTPException(BibliotecaHTTPException):
     status_code = 409
     detail = "Пользователь с таким email уже существует"
@@ -1,5 +1,43 @@
+from src.connectors.mongo_connector import MongoManager
 from src.connectors.redis_connector import RedisManager
 from src.config import settings
+from src.utils.causal_consistency import LastWriteTimes
+from src.utils.circuit_breaker import CircuitBreaker
+from src.utils.invalidation import InvalidationBus
+from src.utils.rate_limiter import LoginRateLimiter
+from src.utils.write_behind import WriteBehindBuffer
 
 
-redis_manager = RedisManager(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+redis_manager = RedisManager(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    op_timeout=settings.REDIS_OP_TIMEOUT_MS / 1000,
+    breaker=CircuitBreaker(settings.REDIS_BREAKER_FAILURES, settings.REDIS_BREAKER_RESET_SECONDS),
+    # +1 — соединение подписки InvalidationBus, его pub/sub берёт из того же пула и не отдаёт
+    max_connections=settings.REDIS_POOL_SIZE + 1,
+)
+
+mongo_manager = MongoManager(settings.DB_URL, max_pool_size=settings.DB_POOL_SIZE)
+
+invalidation_bus = InvalidationBus(redis_manager, channel="invalidation:users")
+
+login_rate_limiter = LoginRateLimiter(
+    redis_manager,
+    ip_capacity=settings.LOGIN_RATE_IP_CAPACITY,
+    ip_refill=settings.LOGIN_RATE_IP_REFILL,
+    email_capacity=settings.LOGIN_RATE_EMAIL_CAPACITY,
+    email_refill=settings.LOGIN_RATE_EMAIL_REFILL,
+    blocked_cache_size=settings.LOGIN_BLOCKED_CACHE_SIZE,
+    workers=settings.WORKERS,
+)
+
+last_write_times = LastWriteTimes(redis_manager, ttl=settings.DB_MAX_STALENESS_SECONDS)
+
+# активность пользователей пишется в users пачками из фоновой задачи lifespan
+activity_buffer = WriteBehindBuffer(
+    flush_size=settings.ACTIVITY_FLUSH_SIZE,
+    flush_interval=settings.ACTIVITY_FLUSH_INTERVAL,
+    max_backlog=settings.ACTIVITY_MAX_BACKLOG,
+    max_attempts=settings.ACTIVITY_MAX_ATTEMPTS,
+    metrics_interval=settings.ACTIVITY_METRICS_INTERVAL,
+)
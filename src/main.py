@@ -1,34 +1,68 @@
 from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
 import logging
 import sys
+import time
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
 
 sys.path.append(str(Path(__file__).parent.parent))
 logging.basicConfig(level=logging.INFO)
 
 from src.api.auth import router as router_auth  # noqa: E402
+from src.api.responses import AppJSONResponse  # noqa: E402
 from src.config import settings  # noqa: E402
-from src.init import redis_manager  # noqa: E402
+from src.init import activity_buffer, invalidation_bus, mongo_manager, redis_manager  # noqa: E402
+from src.services.auth import ACTIVITY_FIELDS  # noqa: E402
+from src.startup import log_startup_phases, startup_phase, startup_phases, warm_up  # noqa: E402
 from src.utils.db_manager import DBManager  # noqa: E402
+from src.utils.invalidation import ChangeStreamWatcher  # noqa: E402
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await redis_manager.connect()
-    async with DBManager(settings.DB_URL, settings.DB_NAME) as db:
-        await db.init_indexes()
-    yield
+    warm_up()
+    with startup_phase("redis"):
+        await redis_manager.connect()
+    await mongo_manager.connect()
+    async with DBManager(settings.DB_URL, settings.DB_NAME, client=mongo_manager.client) as db:
+        with startup_phase("mongo"):
+            await db.init_indexes()
+        tasks = [
+            asyncio.create_task(invalidation_bus.listen()),
+            asyncio.create_task(activity_buffer.run(db.users.collection)),
+        ]
+        if settings.CHANGE_STREAM_ENABLED:
+            watcher = ChangeStreamWatcher(
+                db.users.collection,
+                invalidation_bus,
+                redis_manager,
+                ignored_fields=(*ACTIVITY_FIELDS, activity_buffer.batch_field),
+            )
+            tasks.append(asyncio.create_task(watcher.run()))
+        log_startup_phases()
+        yield
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await activity_buffer.flush()
+        logging.info(f"Отложенная запись активности при остановке: {activity_buffer.metrics()}")
+    await mongo_manager.close()
     await redis_manager.close()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=AppJSONResponse)
 app.include_router(router_auth)
 
 app.add_middleware(CORSMiddleware, allow_origins=["*"])
 
+startup_phases["import"] = (time.perf_counter() - _import_started) * 1000
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host="0.0.0.0", reload=True)
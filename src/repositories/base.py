@@ -1,18 +1,55 @@
 from bson import ObjectId
-from typing import Any
+from copy import copy
+from typing import Any, Awaitable, Callable, Self
 
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorCollection, AsyncIOMotorDatabase
 from pydantic import BaseModel
 from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.read_preferences import _ServerMode
 
 from src.exceptions import ObjectAlreadyExistsException, ObjectNotFoundException
 
 
 class BaseRepository:
     collection_name: str
-
-    def __init__(self, db: AsyncIOMotorDatabase):
+    # счётчик версий документа: выставляется при вставке и увеличивается каждым edit
+    version_field = "version"
+    # массовые чтения, которые можно отдавать вторичным узлам replica set;
+    # остальные методы читают с primary
+    secondary_read_methods: frozenset[str] = frozenset({"get_filtered", "get_batch_by_ids"})
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        secondary_reads: _ServerMode | None = None,
+        get_session: Callable[[], Awaitable[AsyncIOMotorClientSession]] | None = None,
+    ):
         self.collection = db[self.collection_name]
+        # сессию открывает владелец репозитория при первой операции, а не заранее
+        self.get_session = get_session
+        self._secondary_collection = (
+            self.collection.with_options(read_preference=secondary_reads) if secondary_reads else self.collection
+        )
+        self._forced_collection: AsyncIOMotorCollection | None = None
+
+    def reading(self, read_preference: _ServerMode) -> Self:
+        """
+        Копия репозитория, все чтения которой идут с read_preference,
+        например выгрузка с реплик. Записи по-прежнему идут на primary.
+        """
+        repository = copy(self)
+        repository._forced_collection = self.collection.with_options(read_preference=read_preference)
+        return repository
+
+    async def _session(self) -> AsyncIOMotorClientSession | None:
+        return await self.get_session() if self.get_session else None
+
+    def _reader(self, method: str) -> AsyncIOMotorCollection:
+        if self._forced_collection is not None:
+            return self._forced_collection
+        if method in self.secondary_read_methods:
+            return self._secondary_collection
+        return self.collection
 
     async def get_filtered(self, *filters: dict[str, Any], **filter_by: Any) -> list[Any]:
         """
@@ -25,7 +62,9 @@ class BaseRepository:
             query_filter.update(f)
         query_filter.update(filter_by)
 
-        cursor = self.collection.find(query_filter)
+        cursor = self._reader("get_filtered").find(
+            query_filter, self.mapper.projection, session=await self._session()
+        )
         documents = await cursor.to_list(length=None)
 
         return [self.mapper.map_to_domain_entity(doc) for doc in documents]
@@ -43,7 +82,9 @@ class BaseRepository:
 
         object_ids = [ObjectId(i) for i in ids_to_get]
 
-        cursor = self.collection.find({"_id": {"$in": object_ids}})
+        cursor = self._reader("get_batch_by_ids").find(
+            {"_id": {"$in": object_ids}}, self.mapper.projection, session=await self._session()
+        )
         documents = await cursor.to_list(length=len(object_ids))
 
         return [self.mapper.map_to_domain_entity(doc) for doc in documents]
@@ -53,7 +94,9 @@ class BaseRepository:
         Вернёт один документ по переданным ключам filter_by
         или None, если ничего не найдено.
         """
-        document = await self.collection.find_one(filter_by)
+        document = await self._reader("get_one_or_none").find_one(
+            filter_by, self.mapper.projection, session=await self._session()
+        )
 
         return self.mapper.map_to_domain_entity(document)
 
@@ -65,7 +108,9 @@ class BaseRepository:
         if "id" in filter_by:
             raw_id = filter_by.pop("id")
             filter_by["_id"] = ObjectId(raw_id)
-        document = await self.collection.find_one(filter_by)
+        document = await self._reader("get_one").find_one(
+            filter_by, self.mapper.projection, session=await self._session()
+        )
         if not document:
             raise ObjectNotFoundException
 
@@ -77,12 +122,15 @@ class BaseRepository:
         При попытке вставить дубликат бросает ObjectAlreadyExistsException.
         """
         doc = data.model_dump()
+        doc[self.version_field] = 1
         try:
-            result = await self.collection.insert_one(doc)
+            result = await self.collection.insert_one(doc, session=await self._session())
         except DuplicateKeyError:
             raise ObjectAlreadyExistsException
 
-        inserted = await self.collection.find_one({"_id": result.inserted_id})
+        inserted = await self.collection.find_one(
+            {"_id": result.inserted_id}, self.mapper.projection, session=await self._session()
+        )
         return self.mapper.map_to_domain_entity(inserted)
 
     async def add_batch(self, data: list[Any]) -> list[Any]:
@@ -91,31 +139,41 @@ class BaseRepository:
         Возвращает список доменных сущностей.
         В случае ошибки массовой записи бросает ObjectAlreadyExistsException.
         """
-        docs = [item.model_dump() for item in data]
+        docs = [item.model_dump() | {self.version_field: 1} for item in data]
         try:
-            result = await self.collection.insert_many(docs, ordered=False)
+            result = await self.collection.insert_many(docs, ordered=False, session=await self._session())
         except BulkWriteError:
             raise ObjectAlreadyExistsException
 
         # получаем вставленные документы по их _id (чтобы получить все поля, включая _id)
         inserted_ids = result.inserted_ids
-        cursor = self.collection.find({"_id": {"$in": inserted_ids}})
+        cursor = self.collection.find(
+            {"_id": {"$in": inserted_ids}}, self.mapper.projection, session=await self._session()
+        )
         inserted_docs = await cursor.to_list(length=len(inserted_ids))
 
         return [self.mapper.map_to_domain_entity(doc) for doc in inserted_docs]
 
-    async def edit(self, data: BaseModel, exclude_unset: bool = False, **filter_by: Any) -> int:
+    async def edit(
+        self, data: BaseModel, exclude_unset: bool = False, versioned: bool = True, **filter_by: Any
+    ) -> int:
         """
         Обновляет один документ по фильтру filter_by значениями из data.
         Сначала проверяет, что документ существует (через get_one), иначе бросает ObjectNotFoundException.
+        В том же update_one атомарно увеличивает версию документа; versioned=False — для полей,
+        которых нет в ответах API (например, перехэшированный пароль): версия и ETag не меняются.
         Возвращает количество изменённых полей (modified_count).
         """
         if "id" in filter_by:
             raw_id = filter_by.pop("id")
             filter_by["_id"] = ObjectId(raw_id)
         update_data = data.model_dump(exclude_unset=exclude_unset)
+        update_data.pop(self.version_field, None)
+        update: dict[str, Any] = {"$set": update_data}
+        if versioned:
+            update["$inc"] = {self.version_field: 1}
         try:
-            result = await self.collection.update_one(filter_by, {"$set": update_data})
+            result = await self.collection.update_one(filter_by, update, session=await self._session())
         except DuplicateKeyError:
             raise ObjectAlreadyExistsException
 
@@ -129,7 +187,7 @@ class BaseRepository:
         Возвращает количество удалённых документов (0 или 1).
         """
         await self.get_one(**filter_by)
-        result = await self.collection.delete_one(filter_by)
+        result = await self.collection.delete_one(filter_by, session=await self._session())
         return result.deleted_count
 
     async def delete_batch_by_ids(self, ids_to_delete: list[str]) -> int:
@@ -142,5 +200,5 @@ class BaseRepository:
             return 0
 
         object_ids = [ObjectId(i) for i in ids_to_delete]
-        result = await self.collection.delete_many({"_id": {"$in": object_ids}})
+        result = await self.collection.delete_many({"_id": {"$in": object_ids}}, session=await self._session())
         return result.deleted_count
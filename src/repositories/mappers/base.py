@@ -1,12 +1,15 @@
-from typing import Generic, TypeVar, Type
+from typing import Any, Generic, TypeVar, Type
 from pydantic import BaseModel
 from bson import ObjectId
 
 SchemaType = TypeVar("SchemaType", bound=BaseModel)
+RecordType = TypeVar("RecordType", bound=tuple)
 
 
 class DataMapper(Generic[SchemaType]):
     schema: Type[SchemaType]
+    # поля, которые репозиторий запрашивает у Mongo; None — документ целиком
+    projection: dict[str, int] | None = None
 
     @classmethod
     def map_to_domain_entity(cls, data: dict | None) -> SchemaType | None:
@@ -14,7 +17,7 @@ class DataMapper(Generic[SchemaType]):
             return None
 
         if "_id" in data:
-            data["id"] = str(data.pop("_id"))
+            data = {**data, "id": str(data["_id"])}
 
         return cls.schema.model_validate(data)
 
@@ -30,3 +33,32 @@ class DataMapper(Generic[SchemaType]):
             raw["_id"] = ObjectId(raw.pop("id"))
 
         return raw
+
+
+class RecordDataMapper(Generic[RecordType]):
+    """
+    Документ Mongo -> NamedTuple-запись без pydantic-валидации и без изменения документа.
+    Первое поле записи — id, оно берётся из _id; остальные читаются по имени,
+    а projection просит у Mongo только их.
+    """
+
+    schema: Type[RecordType]
+    projection: dict[str, int]
+    _layout: tuple[tuple[str, Any], ...]
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        id_field, *fields = cls.schema._fields  # type: ignore
+        if id_field != "id":
+            raise TypeError(f"{cls.schema.__name__}: первым полем записи должен быть id")
+        defaults = cls.schema._field_defaults  # type: ignore
+        cls._layout = tuple((field, defaults.get(field)) for field in fields)
+        cls.projection = {field: 1 for field in fields}
+
+    @classmethod
+    def map_to_domain_entity(cls, data: dict | None) -> RecordType | None:
+        if data is None:
+            return None
+        return cls.schema._make(  # type: ignore
+            (str(data["_id"]), *[data.get(field, default) for field, default in cls._layout])
+        )
@@ -1,10 +1,10 @@
-from src.repositories.mappers.base import DataMapper
-from src.schemas.users import UserDTO, UserWithHashedPasswordDTO
+from src.repositories.mappers.base import RecordDataMapper
+from src.schemas.users import UserRecord, UserWithHashedPasswordRecord
 
 
-class UserDataMapper(DataMapper[UserDTO]):
-    schema = UserDTO
+class UserDataMapper(RecordDataMapper[UserRecord]):
+    schema = UserRecord
 
 
-class UserWithHashedPasswordDataMapper(DataMapper):
-    schema = UserWithHashedPasswordDTO
+class UserWithHashedPasswordDataMapper(RecordDataMapper[UserWithHashedPasswordRecord]):
+    schema = UserWithHashedPasswordRecord
@@ -8,32 +8,27 @@ from src.repositories.mappers.mappers import (
     UserDataMapper,
     UserWithHashedPasswordDataMapper,
 )
-from src.schemas.users import UserWithHashedPasswordDTO
+from src.schemas.users import UserWithHashedPasswordRecord
 
 
 class UsersRepository(BaseRepository):
     collection_name = "users"
     mapper = UserDataMapper
 
-    async def get_user_with_hashed_password(self, email: EmailStr) -> UserWithHashedPasswordDTO:
+    async def get_user_with_hashed_password(self, email: EmailStr) -> UserWithHashedPasswordRecord:
         """
-        Находит по email и возвращает DTO с полем hashed_password.
+        Находит по email и возвращает запись с полем hashed_password.
         Бросает UserNotFoundException, если не найден.
         """
-        # Ищем документ, сразу проецируем только нужные поля
+        # Ищем документ, сразу проецируем только нужные поля.
+        # Всегда с primary, даже в копии из reading(): хэш на реплике может быть ещё старым
         document: dict[str, Any] | None = await self.collection.find_one(
             {"email": email},
-            {
-                "email": 1,
-                "hashed_password": 1,
-                "_id": 1,
-                "first_name": 1,
-                "last_name": 1,
-                "role": 1,
-            },
+            UserWithHashedPasswordDataMapper.projection,
+            session=await self._session(),
         )
         if not document:
             raise UserNotFoundException
 
-        # Маппим документ в DTO
+        # Маппим документ в запись
         return UserWithHashedPasswordDataMapper.map_to_domain_entity(document)
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class StatusDTO(BaseModel):
+    status: str = "OK"
+
+
+class AccessTokenDTO(BaseModel):
+    access_token: str
@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Literal, NamedTuple
 
 from pydantic import BaseModel, EmailStr, Field
 
@@ -17,6 +17,11 @@ class UserDTO(BaseModel):
     last_name: str
     email: EmailStr
     role: Literal["user", "admin", "author"]
+    version: int = 0
+
+
+class UserHashedPasswordDTO(BaseModel):
+    hashed_password: str
 
 
 class UserLoginDTO(BaseModel):
@@ -48,5 +53,29 @@ class UserRegisterDTO(UserPutDTO):
     role: Literal["user", "admin", "author"] = "user"
 
 
-class UserWithHashedPasswordDTO(UserDTO):
+class UserRecord(NamedTuple):
+    """
+    Пользователь внутри сервиса: кортеж без pydantic, в несколько раз меньше UserDTO.
+    Данные приходят из нашей же базы, поэтому в UserDTO переводятся без валидации
+    и только на границе API.
+    """
+
+    id: str
+    first_name: str
+    last_name: str
+    email: str
+    role: str
+    version: int = 0
+
+    def to_dto(self) -> UserDTO:
+        return UserDTO.model_construct(**self._asdict())
+
+
+class UserWithHashedPasswordRecord(NamedTuple):
+    id: str
+    first_name: str
+    last_name: str
+    email: str
+    role: str
     hashed_password: str
+    version: int = 0
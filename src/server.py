@@ -0,0 +1,326 @@
+"""
+Пре-форк запуск для продакшена:
+    python -m src.server --host 0.0.0.0 --port 8000 --workers 4
+
+Мастер-процесс импортирует приложение, прогревает его (warm_up) и открывает сокет,
+затем форкает WEB_WORKERS воркеров uvicorn — они получают импортированные модули,
+настройки и прогретые backend'ы хэширования без повторной работы.
+Клиенты Mongo и Redis создаются в lifespan каждого воркера уже после fork.
+
+Сигналы мастеру:
+    SIGHUP           воркеры по одному корректно завершаются и заменяются новыми форками
+                     этого же мастера — с кодом и Settings, загруженными при его старте
+    SIGUSR2          обновление кода и Settings (.env): мастер запускает ту же команду заново
+                     и передаёт новому мастеру открытый сокет; когда воркеры нового мастера
+                     проработают MIN_WORKER_LIFETIME, он шлёт SIGTERM старому, и тот
+                     останавливает свои воркеры. Если новый код не стартует, старый мастер
+                     продолжает работать, а новый надо остановить вручную
+    SIGTERM, SIGINT  корректная остановка всех воркеров
+Сокет остаётся открытым в мастере, поэтому пока воркер заменяется, новые соединения
+ждут в очереди сокета и принимаются остальными воркерами, а не сбрасываются.
+Новый мастер после SIGUSR2 — дочерний процесс старого и переживает его. Супервизор,
+который следит за pid запущенного процесса (systemd с Type=simple), его не увидит:
+под таким супервизором код обновляется перезапуском сервиса.
+"""
+
+from pathlib import Path
+import argparse
+import asyncio
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+
+import uvicorn
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.config import settings  # noqa: E402
+
+MEMORY_CHECK_INTERVAL = 5.0
+# сколько при остановке воркера ждать первый запрос в уже принятых соединениях
+ACCEPTED_DRAIN_SECONDS = 1.0
+# воркер, упавший быстрее этого, заменяется не раньше чем через столько же, чтобы не крутить fork в цикле
+MIN_WORKER_LIFETIME = 1.0
+# через окружение мастер передаёт новому мастеру по SIGUSR2 сокет и свой pid
+LISTEN_FD_ENV = "SERVER_LISTEN_FD"
+PREDECESSOR_PID_ENV = "SERVER_PREDECESSOR_PID"
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+
+        # пиковый, а не текущий RSS; в Linux в килобайтах, в macOS в байтах
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _watch_memory(server, limit_mb: int) -> None:
+    """Фоновый поток воркера: при RSS выше limit_mb просит uvicorn корректно завершиться"""
+    while not server.should_exit:
+        rss = _rss_mb()
+        if rss > limit_mb:
+            logging.warning(f"Воркер {os.getpid()} занял {rss:.0f} МБ при лимите {limit_mb} МБ, перезапускаю")
+            server.should_exit = True
+            return
+        time.sleep(MEMORY_CHECK_INTERVAL)
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    Опирается на внутренности uvicorn (servers, server_state.connections, connection.cycle),
+    поэтому версия uvicorn в pyproject.toml закреплена до минорной.
+    """
+
+    async def shutdown(self, sockets: list[socket.socket] | None = None) -> None:
+        # uvicorn сразу закрывает соединения, в которых ещё нет запроса, а воркер мог принять
+        # их из очереди сокета за миг до остановки — даём клиентам прислать запрос
+        for server in self.servers:
+            server.close()
+        deadline = time.monotonic() + ACCEPTED_DRAIN_SECONDS
+        while time.monotonic() < deadline and any(
+            getattr(connection, "cycle", None) is None for connection in self.server_state.connections
+        ):
+            await asyncio.sleep(0.01)
+        await super().shutdown(sockets)
+
+
+def run_worker(app, sock: socket.socket, max_requests: int | None) -> None:
+    from src.startup import startup_phases
+
+    # фазы мастера воркер не повторяет, в его журнал попадут только свои
+    startup_phases.clear()
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        limit_max_requests=max_requests,
+        timeout_graceful_shutdown=settings.WORKER_GRACEFUL_TIMEOUT,
+    )
+    server = DrainingServer(config)
+    if settings.WORKER_MAX_MEMORY_MB:
+        threading.Thread(target=_watch_memory, args=(server, settings.WORKER_MAX_MEMORY_MB), daemon=True).start()
+    server.run(sockets=[sock])
+
+
+class Arbiter:
+    """
+    Держит workers воркеров: заменяет завершившихся (по лимиту запросов, памяти или из-за сбоя),
+    по SIGHUP заменяет всех по одному, по SIGUSR2 запускает новый мастер с тем же сокетом,
+    по SIGTERM/SIGINT останавливает.
+    Воркеры заменяются после выхода старого, поэтому одновременно их не больше workers
+    и суммарные пулы соединений не выходят за DB_MAX_CONNECTIONS и REDIS_MAX_CONNECTIONS.
+    """
+
+    def __init__(self, app, sock: socket.socket, workers: int) -> None:
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.graceful_timeout = settings.WORKER_GRACEFUL_TIMEOUT
+        self._pids: dict[int, float] = {}
+        self._retiring: list[int] = []
+        self._retiring_deadline: float | None = None
+        self._stopping = False
+        self._reload_requested = False
+        self._reexec_requested = False
+        self._respawn_at = 0.0
+        self._successor: int | None = None
+        # мастер, запущенный по SIGUSR2, останавливает предыдущий, когда его воркеры поднялись
+        predecessor = os.environ.pop(PREDECESSOR_PID_ENV, None)
+        self._predecessor = int(predecessor) if predecessor else None
+
+    def _max_requests(self) -> int | None:
+        if not settings.WORKER_MAX_REQUESTS:
+            return None
+        return settings.WORKER_MAX_REQUESTS + random.randint(0, settings.WORKER_MAX_REQUESTS_JITTER)
+
+    def spawn(self) -> None:
+        max_requests = self._max_requests()
+        pid = os.fork()
+        if pid:
+            self._pids[pid] = time.monotonic()
+            return
+        # воркер: INT и TERM перехватывает uvicorn, HUP и USR2 адресованы только мастеру
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGUSR2, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(self.app, self.sock, max_requests)
+        except BaseException:
+            logging.exception(f"Воркер {os.getpid()} завершился с ошибкой")
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def _handle_stop(self, signum: int, frame) -> None:
+        self._stopping = True
+
+    def _handle_reload(self, signum: int, frame) -> None:
+        self._reload_requested = True
+
+    def _handle_reexec(self, signum: int, frame) -> None:
+        self._reexec_requested = True
+
+    def _reexec(self) -> None:
+        """SIGUSR2: новый мастер из той же команды, сокет передаётся ему открытым"""
+        if self._successor is not None:
+            logging.warning(f"Новый мастер {self._successor} уже запущен, SIGUSR2 пропущен")
+            return
+        env = dict(os.environ, **{LISTEN_FD_ENV: str(self.sock.fileno()), PREDECESSOR_PID_ENV: str(os.getpid())})
+        pid = os.fork()
+        if pid:
+            self._successor = pid
+            logging.info(f"Запущен новый мастер {pid}, воркеры остановятся, когда он будет готов")
+            return
+        try:
+            os.execve(sys.executable, [sys.executable, *sys.orig_argv[1:]], env)
+        finally:
+            os._exit(1)
+
+    def _release_predecessor(self) -> None:
+        """Новый мастер останавливает старый, когда все его воркеры пережили MIN_WORKER_LIFETIME"""
+        settled_before = time.monotonic() - MIN_WORKER_LIFETIME
+        if len(self._pids) < self.workers or any(started > settled_before for started in self._pids.values()):
+            return
+        logging.info(f"Воркеры запущены, останавливаю прежний мастер {self._predecessor}")
+        try:
+            os.kill(self._predecessor, signal.SIGTERM)  # type: ignore
+        except ProcessLookupError:
+            pass
+        self._predecessor = None
+
+    def _reap(self) -> None:
+        while self._pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            started = self._pids.pop(pid, None)
+            if started is None:
+                if pid == self._successor:
+                    code = os.waitstatus_to_exitcode(status)
+                    logging.error(f"Новый мастер {pid} завершился с кодом {code}, работают прежние воркеры")
+                    self._successor = None
+                continue
+            if pid in self._retiring:
+                self._retiring.remove(pid)
+                self._retiring_deadline = None
+            code = os.waitstatus_to_exitcode(status)
+            logging.info(f"Воркер {pid} завершился с кодом {code} через {time.monotonic() - started:.0f} с")
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                # без паузы в цикле мастера: сигналы и остальные воркеры обслуживаются как обычно
+                self._respawn_at = time.monotonic() + MIN_WORKER_LIFETIME
+
+    def _retire_next(self) -> None:
+        """Замена по SIGHUP: следующий старый воркер получает SIGTERM, только когда предыдущий вышел"""
+        if self._retiring_deadline is not None:
+            if time.monotonic() > self._retiring_deadline:
+                pid = self._retiring[0]
+                logging.warning(f"Воркер {pid} не завершился за {self.graceful_timeout} с, SIGKILL")
+                os.kill(pid, signal.SIGKILL)
+                self._retiring_deadline = None
+            return
+        while self._retiring and self._retiring[0] not in self._pids:
+            self._retiring.pop(0)
+        if self._retiring and len(self._pids) >= self.workers:
+            os.kill(self._retiring[0], signal.SIGTERM)
+            # запас сверх таймаута uvicorn — на остановку lifespan и сброс буферов
+            self._retiring_deadline = time.monotonic() + self.graceful_timeout + 5
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+        signal.signal(signal.SIGUSR2, self._handle_reexec)
+        logging.info(f"Мастер {os.getpid()} запускает {self.workers} воркеров")
+        while not self._stopping:
+            if self._reload_requested:
+                self._reload_requested = False
+                self._retiring = list(self._pids)
+                logging.info(f"Перезапуск воркеров по одному: {self._retiring}")
+            if self._reexec_requested:
+                self._reexec_requested = False
+                self._reexec()
+            self._reap()
+            self._retire_next()
+            while not self._stopping and len(self._pids) < self.workers and time.monotonic() >= self._respawn_at:
+                self.spawn()
+            if self._predecessor is not None:
+                self._release_predecessor()
+            time.sleep(0.1)
+        self.stop()
+
+    def stop(self) -> None:
+        logging.info("Останавливаю воркеры")
+        for pid in self._pids:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._pids and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self._pids:
+            logging.warning(f"Воркер {pid} не завершился за {self.graceful_timeout} с, SIGKILL")
+            os.kill(pid, signal.SIGKILL)
+        self.sock.close()
+
+
+def bind(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def listen_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Сокет, переданный прежним мастером по SIGUSR2, иначе новый"""
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is None:
+        return bind(host, port, backlog)
+    sock = socket.socket(fileno=int(fd))
+    sock.set_inheritable(True)
+    return sock
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=0, help="по умолчанию WEB_WORKERS")
+    parser.add_argument("--backlog", type=int, default=2048)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    # до импорта приложения: размеры пулов в src.init считаются от числа воркеров
+    if args.workers:
+        settings.WEB_WORKERS = args.workers
+
+    from src.main import app
+    from src.startup import log_startup_phases, warm_up
+
+    # стоимость хэша подбирается здесь один раз и достаётся всем воркерам
+    warm_up(calibrate=True)
+    log_startup_phases()
+    logging.info(
+        f"Пулы на воркер: Mongo {settings.DB_POOL_SIZE} из {settings.DB_MAX_CONNECTIONS}, "
+        f"Redis {settings.REDIS_POOL_SIZE} + 1 на подписку из {settings.REDIS_MAX_CONNECTIONS}"
+    )
+    Arbiter(app, listen_socket(args.host, args.port, args.backlog), settings.WORKERS).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from datetime import datetime, timezone, timedelta
 from typing import Any
+import logging
+
 import jwt
 
 from fastapi import Request, Response
@@ -10,25 +12,76 @@ from src.exceptions import (
     InvalidJWTException,
     JWTMissingException,
     ObjectAlreadyExistsException,
+    ObjectNotFoundException,
     UserAlreadyExistsException,
     UserAlreadyLoggedInException,
     UserAlreadyLoggedOutException,
     UserNotFoundException,
     WrongPasswordException,
 )
+from src.init import activity_buffer, invalidation_bus, last_write_times, login_rate_limiter
 from src.schemas.users import (
     UserAddDTO,
+    UserHashedPasswordDTO,
     UserLoginDTO,
     UserRegisterDTO,
     UserPutAdminDTO,
     UserPutDTO,
     UserPutRequest,
+    UserRecord,
 )
 from src.services.base import BaseService
+from src.utils.password_hashing import build_crypt_context, calibrate_hash_cost
+
+
+# поля, которые дописывает activity_buffer: на ответы API не влияют, кэши из-за них не сбрасываются
+ACTIVITY_FIELDS = ("last_login_at", "login_count")
 
 
 class AuthService(BaseService):
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    # собирается при первом хэшировании или в warm_up(), а не при импорте
+    _pwd_context: CryptContext | None = None
+
+    @classmethod
+    def get_pwd_context(cls) -> CryptContext:
+        if cls._pwd_context is None:
+            cls._pwd_context = build_crypt_context(
+                settings.PASSWORD_HASH_SCHEME,
+                settings.BCRYPT_ROUNDS,
+                settings.ARGON2_TIME_COST,
+                settings.ARGON2_MEMORY_COST,
+                settings.ARGON2_PARALLELISM,
+            )
+        return cls._pwd_context
+
+    @classmethod
+    def calibrate_password_hashing(cls) -> None:
+        """
+        Подбирает стоимость хэша под PASSWORD_HASH_TARGET_MS и записывает её в settings.
+        Вызывается один раз в мастер-процессе до fork: воркеры получают уже подобранные
+        значения и не калибруются сами, иначе разные воркеры выбрали бы разную стоимость
+        и needs_update перехэшировал бы пароли то под одну, то под другую.
+        """
+        settings.BCRYPT_ROUNDS, settings.ARGON2_TIME_COST = calibrate_hash_cost(
+            settings.PASSWORD_HASH_SCHEME,
+            settings.PASSWORD_HASH_TARGET_MS,
+            settings.BCRYPT_ROUNDS,
+            settings.ARGON2_TIME_COST,
+            settings.ARGON2_MEMORY_COST,
+            settings.ARGON2_PARALLELISM,
+        )
+        settings.PASSWORD_HASH_TARGET_MS = 0
+        cls._pwd_context = None
+        logging.info(
+            f"Хэширование паролей: scheme={settings.PASSWORD_HASH_SCHEME}, bcrypt_rounds={settings.BCRYPT_ROUNDS}, "
+            f"argon2_time_cost={settings.ARGON2_TIME_COST}; чтобы все экземпляры хэшировали одинаково, "
+            f"задайте эти значения в настройках и PASSWORD_HASH_TARGET_MS=0"
+        )
+
+    @classmethod
+    def load_password_hashing(cls) -> None:
+        """Заранее загружает backend схемы по умолчанию, чтобы не платить за это в первом входе"""
+        cls.get_pwd_context().handler().get_backend()
 
     async def register_user(self, user_data: UserRegisterDTO) -> None:
         hashed_password = self.hash_password(user_data.password)
@@ -47,8 +100,20 @@ class AuthService(BaseService):
     async def login_user(self, request: Request, user_data: UserLoginDTO) -> str:
         if "access_token" in request.cookies:
             raise UserAlreadyLoggedInException
+        await login_rate_limiter.check(request.client.host if request.client else None, user_data.email)
         user = await self.db.users.get_user_with_hashed_password(email=user_data.email)  # type: ignore
         self.verify_password(user_data.password, user.hashed_password)
+        if self.get_pwd_context().needs_update(user.hashed_password):
+            # профиль не изменился: версия и ETag остаются прежними
+            await self.db.users.edit(  # type: ignore
+                UserHashedPasswordDTO(hashed_password=self.hash_password(user_data.password)),
+                versioned=False,
+                id=user.id,
+            )
+        # без обращения к Mongo: запись уйдёт пачкой из activity_buffer
+        activity_buffer.record(
+            user.id, {"$max": {"last_login_at": datetime.now(timezone.utc)}, "$inc": {"login_count": 1}}
+        )
         return self.create_access_token({"user_id": user.id, "role": user.role})
 
     async def logout_user(self, request: Request, response: Response) -> None:
@@ -72,6 +137,8 @@ class AuthService(BaseService):
             await self.db.users.edit(new_user_data, exclude_unset=True, id=user_id)
         except ObjectAlreadyExistsException:
             raise UserAlreadyExistsException
+        await last_write_times.remember(user_id, self.db.session)
+        await invalidation_bus.notify(user_id)
 
     async def admin_edit_user(self, user_email: str, user_data: UserPutAdminDTO) -> None:
         user = await self.db.users.get_one(email=user_email)
@@ -82,12 +149,14 @@ class AuthService(BaseService):
             await self.db.users.edit(user_data, exclude_unset=True, email=user_email)
         except ObjectAlreadyExistsException:
             raise UserAlreadyExistsException
+        await last_write_times.remember(user.id, self.db.session)
+        await invalidation_bus.notify(user.id)
 
     def hash_password(self, password: str) -> str:
-        return self.pwd_context.hash(password)
+        return self.get_pwd_context().hash(password)
 
     def verify_password(self, plain_password: str, hashed_password: str) -> None:
-        if not self.pwd_context.verify(plain_password, hashed_password):
+        if not self.get_pwd_context().verify(plain_password, hashed_password):
             raise WrongPasswordException
 
     def create_access_token(self, data: dict[str, Any]) -> str:
@@ -113,6 +182,19 @@ class AuthService(BaseService):
         except jwt.exceptions.DecodeError as _:
             raise InvalidJWTException
 
+    async def get_user(self, user_id: str) -> UserRecord:
+        users = self.db.users  # type: ignore
+        # со вторичного узла читаем, только догнав сессию до последней записи пользователя;
+        # если чтение всё равно обслужит primary (standalone, нет живых вторичных), Redis не трогаем
+        if self.db.secondaries_available and await last_write_times.catch_up(
+            user_id, await self.db.get_session()  # type: ignore
+        ):
+            users = users.reading(self.db.secondary_reads)  # type: ignore
+        try:
+            return await users.get_one(id=user_id)
+        except ObjectNotFoundException:
+            raise UserNotFoundException
+
     async def get_user_role(self, user_id: str) -> str:
         user = await self.db.users.get_one(id=user_id)  # type: ignore
         return user.role
@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+from typing import Iterator
+import logging
+import time
+
+from src.services.auth import AuthService
+
+# длительность фаз старта воркера в миллисекундах, в порядке выполнения
+startup_phases: dict[str, float] = {}
+
+_warmed_up = False
+
+
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_phases[name] = (time.perf_counter() - started) * 1000
+
+
+def warm_up(calibrate: bool = False) -> None:
+    """
+    Подготовка, которую дорого делать в первом запросе и которую можно сделать до fork:
+    загрузка backend'а bcrypt/argon2, а с calibrate=True (только в мастер-процессе) —
+    ещё и калибровка стоимости хэша под PASSWORD_HASH_TARGET_MS.
+    Повторный вызов ничего не делает — воркер, получивший прогретое состояние
+    от мастер-процесса, не греется заново.
+    """
+    global _warmed_up
+    if _warmed_up:
+        return
+    if calibrate:
+        with startup_phase("password_calibration"):
+            AuthService.calibrate_password_hashing()
+    with startup_phase("password_hashing"):
+        AuthService.load_password_hashing()
+    _warmed_up = True
+
+
+def log_startup_phases() -> None:
+    phases = ", ".join(f"{name}={elapsed:.1f}" for name, elapsed in startup_phases.items())
+    logging.info(f"Старт воркера по фазам, мс: {phases}; всего {sum(startup_phases.values()):.1f}")
@@ -0,0 +1,53 @@
+from typing import Any
+import logging
+
+from bson import BSON
+
+from src.connectors.redis_connector import RedisManager
+from src.exceptions import RedisUnavailableException
+
+
+class LastWriteTimes:
+    """
+    Время последней записи пользователя в Mongo (operationTime и $clusterTime сессии) в Redis.
+    Следующий запрос пользователя на любом воркере продвигает до него свою causal-consistency
+    сессию, и чтение со вторичного узла дождётся, пока узел догонит эту запись.
+    Запись живёт ttl секунд (max staleness): более старые изменения уже есть
+    на любом узле, которому разрешено отдавать чтения.
+    """
+
+    def __init__(self, redis_manager: RedisManager, ttl: int) -> None:
+        self.redis_manager = redis_manager
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"last_write:users:{user_id}"
+
+    async def remember(self, user_id: str, session: Any) -> None:
+        # без replica set сервер не выдаёт operationTime — догонять нечего
+        if session is None or session.operation_time is None:
+            return
+        times = BSON.encode({"operationTime": session.operation_time, "clusterTime": session.cluster_time})
+        try:
+            await self.redis_manager.set(self._key(user_id), times, self.ttl)
+        except RedisUnavailableException:
+            logging.warning(f"Время записи пользователя {user_id} не сохранено, Redis недоступен")
+
+    async def catch_up(self, user_id: str, session: Any) -> bool:
+        """
+        Продвигает session до последней записи user_id.
+        False — время записи узнать не удалось, читать надо с primary.
+        """
+        if session is None:
+            return False
+        try:
+            raw = await self.redis_manager.get(self._key(user_id))
+        except RedisUnavailableException:
+            return False
+        if raw:
+            times = BSON(raw).decode()
+            if times["clusterTime"]:
+                session.advance_cluster_time(times["clusterTime"])
+            session.advance_operation_time(times["operationTime"])
+        return True
@@ -0,0 +1,36 @@
+import time
+
+
+class CircuitBreaker:
+    """
+    Размыкается после failure_threshold ошибок подряд: вызовы сразу отклоняются.
+    Раз в reset_timeout секунд пропускает один пробный вызов (half-open):
+    успех замыкает цепь, ошибка оставляет её разомкнутой ещё на reset_timeout.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._next_probe_at = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self.failures >= self.failure_threshold
+
+    def allow(self) -> bool:
+        if not self.is_open:
+            return True
+        now = time.monotonic()
+        if now >= self._next_probe_at:
+            self._next_probe_at = now + self.reset_timeout
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures == self.failure_threshold:
+            self._next_probe_at = time.monotonic() + self.reset_timeout
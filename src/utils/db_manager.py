@@ -1,22 +1,93 @@
 from typing import Any
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    ReadPreference,
+    Secondary,
+    SecondaryPreferred,
+    _ServerMode,
+)
+from pymongo.topology_description import TOPOLOGY_TYPE
 import logging
 
 from src.repositories.users import UsersRepository
 
+_READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def secondary_read_preference(mode: str, max_staleness: int) -> _ServerMode:
+    """Read preference для чтений, которые можно отдавать вторичным узлам replica set"""
+    if mode == "primary":
+        return Primary()
+    return _READ_PREFERENCES[mode](max_staleness=max_staleness)
+
 
 class DBManager:
-    def __init__(self, db_url: str, db_name: str):
-        self.client = AsyncIOMotorClient(db_url)
+    """
+    Репозитории на один запрос. Внутри async with работает causal-consistency сессия:
+    чтения этой сессии, в том числе со вторичных узлов, видят её же записи.
+    Сессия открывается при первой операции репозитория или get_session(): запрос,
+    который отвечает из кэша, не трогает драйвер Mongo вовсе.
+    Переданный client общий для воркера и не закрывается; без него DBManager
+    создаёт собственный клиент на db_url и закрывает его на выходе.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        db_name: str,
+        secondary_reads: _ServerMode | None = None,
+        client: AsyncIOMotorClient | None = None,
+    ):
+        self._owns_client = client is None
+        self.client = client or AsyncIOMotorClient(db_url)
         self.db: AsyncIOMotorDatabase = self.client[db_name]
+        self.secondary_reads = secondary_reads or Primary()
+        self.session: AsyncIOMotorClientSession | None = None
+
+        self.users = UsersRepository(self.db, self.secondary_reads)
+
+    @property
+    def reads_from_secondaries(self) -> bool:
+        return self.secondary_reads.mode != ReadPreference.PRIMARY.mode
+
+    @property
+    def secondaries_available(self) -> bool:
+        """
+        Может ли чтение с secondary_reads сейчас уйти на вторичный узел.
+        Standalone-сервер отвечает сам; в replica set смотрим, есть ли доступный вторичный узел
+        с допустимым отставанием. Через mongos и до обнаружения топологии этого не узнать — считаем, что может.
+        """
+        if not self.reads_from_secondaries:
+            return False
+        description = self.client.topology_description
+        if description.topology_type == TOPOLOGY_TYPE.Single:
+            return False
+        if description.topology_type in (TOPOLOGY_TYPE.ReplicaSetWithPrimary, TOPOLOGY_TYPE.ReplicaSetNoPrimary):
+            return description.has_readable_server(Secondary(max_staleness=self.secondary_reads.max_staleness))
+        return True
 
-        self.users = UsersRepository(self.db)
+    async def get_session(self) -> AsyncIOMotorClientSession:
+        if self.session is None:
+            self.session = await self.client.start_session(causal_consistency=True)
+        return self.session
 
     async def __aenter__(self) -> "DBManager":
+        self.users.get_session = self.get_session
         return self
 
     async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
-        self.client.close()
+        if self.session is not None:
+            await self.session.end_session()
+        if self._owns_client:
+            self.client.close()
 
     async def init_indexes(self):
         logging.info(
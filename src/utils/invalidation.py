@@ -0,0 +1,193 @@
+from typing import Any, Awaitable, Callable
+import asyncio
+import inspect
+import logging
+import uuid
+
+from bson import BSON
+from pymongo.errors import OperationFailure
+
+from src.connectors.redis_connector import RedisManager
+from src.exceptions import RedisUnavailableException
+
+# особое сообщение: сбросить всё (например, после потери истории change stream)
+INVALIDATE_ALL = "*"
+
+InvalidationHandler = Callable[[str | None], Awaitable[None] | None]
+
+
+class InvalidationBus:
+    """
+    Локальные кэши процесса подписываются сюда и получают id изменённого пользователя,
+    None — сбросить всё. События публикует путь записи через notify(), а при replica set
+    ещё и ChangeStreamWatcher — он замечает изменения, сделанные в обход сервиса.
+    Общие для всех воркеров данные (ключи Redis) чистят обработчики subscribe_shared:
+    они вызываются один раз, в процессе, который публикует событие.
+    """
+
+    def __init__(self, redis_manager: RedisManager, channel: str) -> None:
+        self.redis_manager = redis_manager
+        self.channel = channel
+        self._handlers: list[InvalidationHandler] = []
+        self._shared_handlers: list[InvalidationHandler] = []
+
+    def subscribe(self, handler: InvalidationHandler) -> None:
+        """handler чистит копию в памяти воркера и вызывается в каждом воркере"""
+        self._handlers.append(handler)
+
+    def subscribe_shared(self, handler: InvalidationHandler) -> None:
+        """handler чистит общее хранилище и вызывается только у публикующего процесса"""
+        self._shared_handlers.append(handler)
+
+    async def dispatch(self, user_id: str | None) -> None:
+        await self._run(self._handlers, user_id)
+
+    async def _run(self, handlers: list[InvalidationHandler], user_id: str | None) -> None:
+        for handler in handlers:
+            try:
+                result = handler(user_id)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logging.exception(f"Ошибка обработчика инвалидации для user_id={user_id}")
+
+    async def publish(self, user_id: str | None) -> None:
+        """Чистит общее хранилище и рассылает событие всем воркерам, включая этот, через Redis"""
+        await self._run(self._shared_handlers, user_id)
+        await self.redis_manager.publish(self.channel, user_id or INVALIDATE_ALL)
+
+    async def notify(self, user_id: str | None) -> None:
+        """
+        Вызывается после успешной записи: чистит общее хранилище, сразу сбрасывает кэши
+        этого воркера, остальные получают событие через Redis. Если Redis недоступен,
+        их копии доживут до TTL — запись от этого не откатывается.
+        """
+        await self._run(self._shared_handlers, user_id)
+        await self.dispatch(user_id)
+        try:
+            await self.redis_manager.publish(self.channel, user_id or INVALIDATE_ALL)
+        except RedisUnavailableException:
+            logging.warning(f"Не удалось опубликовать инвалидацию user_id={user_id}: Redis недоступен")
+
+    async def listen(self, retry_delay: float = 1.0) -> None:
+        """Фоновая задача каждого воркера: события из Redis -> dispatch"""
+        while True:
+            try:
+                async for message in self.redis_manager.subscribe(self.channel):
+                    user_id = message.decode()
+                    await self.dispatch(None if user_id == INVALIDATE_ALL else user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception(f"Подписка на {self.channel} прервана, переподключаюсь")
+            # пока подписки не было, события могли потеряться
+            await self.dispatch(None)
+            await asyncio.sleep(retry_delay)
+
+
+class ChangeStreamWatcher:
+    """
+    Следит за change stream коллекции и публикует id изменённых документов в InvalidationBus.
+    Поток читает только один воркер — тот, кто держит блокировку в Redis;
+    остальные ждут и подхватят поток, если лидер пропадёт.
+    Resume token сохраняется в Redis после каждой публикации, поэтому при рестарте
+    или смене лидера чтение продолжается с последнего события.
+    """
+
+    # коды OperationFailure: resume token уже вытеснен из oplog; Mongo не replica set
+    CHANGE_STREAM_HISTORY_LOST = 286
+    CHANGE_STREAM_UNSUPPORTED = 40573
+
+    def __init__(
+        self,
+        collection: Any,
+        bus: InvalidationBus,
+        redis_manager: RedisManager,
+        lock_ttl_ms: int = 10_000,
+        ignored_fields: tuple[str, ...] = (),
+    ) -> None:
+        self.collection = collection
+        self.bus = bus
+        self.redis_manager = redis_manager
+        self.lock_ttl_ms = lock_ttl_ms
+        self.ignored_fields = ignored_fields
+        self.owner = uuid.uuid4().hex
+        self.lock_key = f"change_stream:{collection.name}:leader"
+        self.token_key = f"change_stream:{collection.name}:resume_token"
+
+    async def run(self) -> None:
+        renew_interval = self.lock_ttl_ms / 3000
+        while True:
+            try:
+                if await self.redis_manager.acquire_lock(self.lock_key, self.owner, self.lock_ttl_ms):
+                    await self._lead(renew_interval)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as exc:
+                if exc.code == self.CHANGE_STREAM_UNSUPPORTED:
+                    logging.warning("Change stream недоступен без replica set, инвалидация только по TTL")
+                    return
+                logging.exception(f"Ошибка чтения change stream {self.collection.name}")
+            except Exception:
+                logging.exception(f"Ошибка чтения change stream {self.collection.name}")
+            await asyncio.sleep(renew_interval)
+
+    async def _lead(self, renew_interval: float) -> None:
+        logging.info(f"Воркер {self.owner} читает change stream {self.collection.name}")
+        follow = asyncio.create_task(self._follow())
+        try:
+            while not follow.done():
+                await asyncio.wait({follow}, timeout=renew_interval)
+                if not follow.done() and not await self.redis_manager.acquire_lock(
+                    self.lock_key, self.owner, self.lock_ttl_ms
+                ):
+                    logging.info(f"Воркер {self.owner} потерял лидерство в change stream")
+                    follow.cancel()
+            if not follow.cancelled():
+                follow.result()
+        finally:
+            follow.cancel()
+
+    async def _follow(self) -> None:
+        resume_after = await self._load_resume_token()
+        # обновление, которое меняет или удаляет только ignored_fields (например, отложенная
+        # запись активности), закэшированные ответы не меняет; любое другое, в том числе
+        # сделанное прямо в Mongo без новой версии документа, вызывает инвалидацию
+        changed_fields = {
+            "$concatArrays": [
+                {"$map": {"input": {"$objectToArray": "$updateDescription.updatedFields"}, "in": "$$this.k"}},
+                {"$ifNull": ["$updateDescription.removedFields", []]},
+            ]
+        }
+        relevant_fields = {
+            "$filter": {"input": changed_fields, "cond": {"$not": [{"$in": ["$$this", list(self.ignored_fields)]}]}}
+        }
+        pipeline = [
+            {
+                "$match": {
+                    "$or": [
+                        {"operationType": {"$in": ["replace", "delete"]}},
+                        {"operationType": "update", "$expr": {"$gt": [{"$size": relevant_fields}, 0]}},
+                    ]
+                }
+            }
+        ]
+        try:
+            async with self.collection.watch(pipeline, resume_after=resume_after) as stream:
+                async for change in stream:
+                    await self.bus.publish(str(change["documentKey"]["_id"]))
+                    await self._save_resume_token(change["_id"])
+        except OperationFailure as exc:
+            if exc.code != self.CHANGE_STREAM_HISTORY_LOST:
+                raise
+            # часть событий потеряна — продолжаем с текущего момента и сбрасываем все кэши
+            logging.warning(f"История change stream {self.collection.name} потеряна, сбрасываю кэши")
+            await self.redis_manager.delete(self.token_key)
+            await self.bus.publish(None)
+
+    async def _load_resume_token(self) -> dict[str, Any] | None:
+        raw = await self.redis_manager.get(self.token_key)
+        return BSON(raw).decode() if raw else None
+
+    async def _save_resume_token(self, token: dict[str, Any]) -> None:
+        await self.redis_manager.set(self.token_key, BSON.encode(token))
@@ -0,0 +1,49 @@
+from collections import OrderedDict
+from typing import Any
+import time
+
+
+class LocalCache:
+    """
+    Кэш в памяти процесса с TTL и вытеснением самых давних записей (LRU).
+    Каждый воркер держит свою копию, поэтому записи надо вычищать
+    по событиям InvalidationBus, а не только по TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def invalidate(self, key: str | None) -> None:
+        """Обработчик InvalidationBus: None означает «сбросить всё»"""
+        if key is None:
+            self.clear()
+        else:
+            self.delete(key)
+
+    def __len__(self) -> int:
+        return len(self._data)
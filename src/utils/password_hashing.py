@@ -0,0 +1,120 @@
+from typing import Literal
+import logging
+import math
+import statistics
+import time
+
+from passlib.context import CryptContext
+from passlib.hash import argon2, bcrypt
+
+BCRYPT_MAX_ROUNDS = 16
+ARGON2_MAX_TIME_COST = 32
+_CALIBRATION_PASSWORD = "calibration-password"
+
+
+def build_crypt_context(
+    scheme: Literal["bcrypt", "argon2"],
+    bcrypt_rounds: int,
+    argon2_time_cost: int,
+    argon2_memory_cost: int,
+    argon2_parallelism: int,
+) -> CryptContext:
+    """
+    Собирает CryptContext с выбранной схемой по умолчанию.
+    Вторая схема остаётся для проверки старых хэшей и помечена устаревшей,
+    а min_rounds заставляет needs_update срабатывать на хэшах с меньшей стоимостью.
+    """
+    schemes = [scheme]
+    other = "argon2" if scheme == "bcrypt" else "bcrypt"
+    if other == "bcrypt" or argon2.has_backend():
+        schemes.append(other)
+    return CryptContext(
+        schemes=schemes,
+        default=scheme,
+        deprecated=[other] if other in schemes else [],
+        bcrypt__default_rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        argon2__rounds=argon2_time_cost,
+        argon2__min_rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+def measure_hash_ms(context: CryptContext, samples: int = 3) -> float:
+    """Медианное время одного hash() в миллисекундах."""
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash(_CALIBRATION_PASSWORD)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int) -> int:
+    """
+    Подбирает rounds bcrypt под target_ms на текущей машине.
+    Каждый раунд удваивает время, поэтому хватает одного замера на min_rounds.
+    """
+    elapsed = measure_hash_ms(CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=min_rounds))
+    extra = math.floor(math.log2(target_ms / elapsed)) if elapsed < target_ms else 0
+    return min(BCRYPT_MAX_ROUNDS, max(bcrypt.min_rounds, min_rounds + extra))
+
+
+def calibrate_argon2_time_cost(
+    target_ms: float, min_time_cost: int, memory_cost: int, parallelism: int
+) -> int:
+    """Подбирает time_cost argon2 под target_ms: время растёт линейно от числа проходов."""
+    context = CryptContext(
+        schemes=["argon2"],
+        argon2__rounds=1,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+    per_pass = measure_hash_ms(context)
+    return min(ARGON2_MAX_TIME_COST, max(min_time_cost, math.floor(target_ms / per_pass)))
+
+
+def calibrate_hash_cost(
+    scheme: Literal["bcrypt", "argon2"],
+    target_ms: int,
+    bcrypt_rounds: int,
+    argon2_time_cost: int,
+    argon2_memory_cost: int,
+    argon2_parallelism: int,
+) -> tuple[int, int]:
+    """
+    (bcrypt_rounds, argon2_time_cost), подобранные под target_ms для схемы scheme.
+    Значения из настроек служат нижней границей; при target_ms == 0 возвращаются как есть.
+    """
+    if target_ms > 0:
+        if scheme == "bcrypt":
+            bcrypt_rounds = calibrate_bcrypt_rounds(target_ms, bcrypt_rounds)
+        else:
+            argon2_time_cost = calibrate_argon2_time_cost(
+                target_ms, argon2_time_cost, argon2_memory_cost, argon2_parallelism
+            )
+    return bcrypt_rounds, argon2_time_cost
+
+
+def calibrated_crypt_context(
+    scheme: Literal["bcrypt", "argon2"],
+    target_ms: int,
+    bcrypt_rounds: int,
+    argon2_time_cost: int,
+    argon2_memory_cost: int,
+    argon2_parallelism: int,
+) -> CryptContext:
+    """CryptContext со стоимостью из calibrate_hash_cost"""
+    bcrypt_rounds, argon2_time_cost = calibrate_hash_cost(
+        scheme, target_ms, bcrypt_rounds, argon2_time_cost, argon2_memory_cost, argon2_parallelism
+    )
+    context = build_crypt_context(
+        scheme, bcrypt_rounds, argon2_time_cost, argon2_memory_cost, argon2_parallelism
+    )
+    logging.info(
+        f"Хэширование паролей: scheme={scheme}, bcrypt_rounds={bcrypt_rounds}, "
+        f"argon2_time_cost={argon2_time_cost}, argon2_memory_cost={argon2_memory_cost}, "
+        f"argon2_parallelism={argon2_parallelism}"
+    )
+    return context
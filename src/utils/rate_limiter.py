@@ -0,0 +1,87 @@
+from collections import OrderedDict
+import math
+import time
+
+from src.connectors.redis_connector import RedisManager
+from src.exceptions import RedisUnavailableException, TooManyLoginAttemptsException
+
+
+class LoginRateLimiter:
+    """
+    Ограничение попыток входа по IP и по email через token bucket в Redis.
+    Проверка идёт до поиска пользователя и bcrypt, поэтому перебор паролей
+    не расходует CPU. Уже заблокированные ключи запоминаются локально
+    до конца блокировки и отсекаются без обращения к Redis.
+    Если Redis недоступен, попытки считают корзины в памяти воркера: ёмкость и пополнение
+    делятся на workers, чтобы вместе воркеры пропускали примерно столько же, сколько Redis.
+    """
+
+    def __init__(
+        self,
+        redis_manager: RedisManager,
+        ip_capacity: int,
+        ip_refill: float,
+        email_capacity: int,
+        email_refill: float,
+        blocked_cache_size: int,
+        workers: int = 1,
+    ) -> None:
+        self.redis_manager = redis_manager
+        self.ip_capacity = ip_capacity
+        self.ip_refill = ip_refill
+        self.email_capacity = email_capacity
+        self.email_refill = email_refill
+        self.blocked_cache_size = blocked_cache_size
+        self.workers = workers
+        self._blocked_until: dict[str, float] = {}
+        # запасные корзины на время недоступности Redis: ключ -> (токены, время обновления)
+        self._local_buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def check(self, ip: str | None, email: str) -> None:
+        """Списывает попытку входа или бросает TooManyLoginAttemptsException."""
+        buckets = [(f"login:email:{email.lower()}", self.email_capacity, self.email_refill)]
+        if ip:
+            buckets.append((f"login:ip:{ip}", self.ip_capacity, self.ip_refill))
+
+        now = time.monotonic()
+        local_wait = max(self._blocked_until.get(key, 0.0) - now for key, _, _ in buckets)
+        if local_wait > 0:
+            raise TooManyLoginAttemptsException(math.ceil(local_wait))
+
+        try:
+            waits = await self.redis_manager.take_tokens(buckets)
+        except RedisUnavailableException:
+            waits = self._take_local_tokens(buckets)
+        if not any(waits):
+            return
+
+        for (key, _, _), wait in zip(buckets, waits):
+            if wait:
+                self._remember_blocked(key, now + wait / 1000)
+        raise TooManyLoginAttemptsException(math.ceil(max(waits) / 1000))
+
+    def _take_local_tokens(self, buckets: list[tuple[str, int, float]]) -> list[int]:
+        """То же, что TOKEN_BUCKET_SCRIPT, но на корзинах в памяти воркера"""
+        now = time.monotonic()
+        tokens, waits = [], []
+        for key, capacity, refill in buckets:
+            capacity, refill = max(1.0, capacity / self.workers), refill / self.workers
+            available, updated_at = self._local_buckets.get(key, (capacity, now))
+            available = min(capacity, available + (now - updated_at) * refill)
+            tokens.append(available)
+            waits.append(0 if available >= 1 else math.ceil((1 - available) / refill * 1000))
+        allowed = not any(waits)
+        for (key, _, _), available in zip(buckets, tokens):
+            self._local_buckets[key] = (available - 1 if allowed else available, now)
+            self._local_buckets.move_to_end(key)
+        while len(self._local_buckets) > self.blocked_cache_size:
+            self._local_buckets.popitem(last=False)
+        return waits
+
+    def _remember_blocked(self, key: str, until: float) -> None:
+        if len(self._blocked_until) >= self.blocked_cache_size:
+            now = time.monotonic()
+            self._blocked_until = {k: v for k, v in self._blocked_until.items() if v > now}
+            while len(self._blocked_until) >= self.blocked_cache_size:
+                del self._blocked_until[next(iter(self._blocked_until))]
+        self._blocked_until[key] = until
@@ -0,0 +1,214 @@
+from typing import Any
+import asyncio
+import logging
+import time
+import uuid
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError, ServerSelectionTimeoutError
+
+# как сливать два обновления одного поля; $inc и $max/$min коммутативны,
+# поэтому буферы разных воркеров можно сбрасывать в любом порядке
+_MERGE = {
+    "$inc": lambda old, new: old + new,
+    "$max": max,
+    "$min": min,
+    "$set": lambda old, new: new,
+}
+
+
+def _merge(pending: dict[str, dict[str, Any]], update: dict[str, dict[str, Any]]) -> None:
+    for operator, fields in update.items():
+        merge = _MERGE[operator]
+        target = pending.setdefault(operator, {})
+        for field, value in fields.items():
+            target[field] = merge(target[field], value) if field in target else value
+
+
+class WriteBehindBuffer:
+    """
+    Отложенная запись частых обновлений, например активности пользователя при входе.
+    record() только сливает обновление с уже накопленным для того же _id и сразу возвращает
+    управление; в Mongo обновления уходят одним bulk_write, когда набралось flush_size
+    документов или прошло flush_interval секунд. При остановке lifespan дописывает остаток.
+
+    Каждый пакет помечается токеном в поле batch_field документа, и обновление применяется,
+    только если токен ещё не записан. Если исход bulk_write неизвестен (обрыв посреди записи),
+    пакет повторяется как есть, с тем же токеном, раньше новых обновлений: уже применённые
+    документы пропускаются и $inc не удваивается. Обновления, отклонённые Mongo (BulkWriteError),
+    возвращаются в буфер и после max_attempts отказов подряд отбрасываются.
+    Сверх max_backlog документов новые обновления отбрасываются.
+    """
+
+    def __init__(
+        self,
+        flush_size: int,
+        flush_interval: float,
+        max_backlog: int,
+        max_attempts: int = 5,
+        metrics_interval: float = 0.0,
+        batch_field: str = "activity_batch",
+    ) -> None:
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.max_attempts = max_attempts
+        self.metrics_interval = metrics_interval
+        self.batch_field = batch_field
+        self.collection: Any = None
+        self._pending: dict[str, dict[str, dict[str, Any]]] = {}
+        self._oldest_at: float | None = None
+        # пакет с неизвестным исходом: (токен, обновления, время самого старого)
+        self._unconfirmed: tuple[str, dict[str, dict[str, dict[str, Any]]], float | None] | None = None
+        self._attempts: dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+
+        self.recorded = 0
+        self.dropped = 0
+        self.abandoned = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.written = 0
+        self.last_flush_ms = 0.0
+
+    def record(self, document_id: str, update: dict[str, dict[str, Any]]) -> None:
+        """update в виде операторов Mongo: {"$inc": {...}, "$max": {...}, "$set": {...}}"""
+        pending = self._pending.get(document_id)
+        if pending is None:
+            if len(self._pending) >= self.max_backlog:
+                self.dropped += 1
+                return
+            pending = self._pending[document_id] = {}
+        _merge(pending, update)
+        self.recorded += 1
+        if self._oldest_at is None:
+            self._oldest_at = time.monotonic()
+        if len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+
+    async def run(self, collection: Any) -> None:
+        """
+        Фоновая задача воркера: сбрасывает буфер по размеру или по времени
+        и раз в metrics_interval секунд пишет метрики в лог
+        """
+        self.collection = collection
+        report_at = time.monotonic() + self.metrics_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self.metrics_interval and time.monotonic() >= report_at:
+                logging.info(f"Отложенная запись активности: {self.metrics()}")
+                report_at = time.monotonic() + self.metrics_interval
+
+    async def flush(self) -> None:
+        if self.collection is None:
+            return
+        if self._unconfirmed is not None:
+            unconfirmed, self._unconfirmed = self._unconfirmed, None
+            if not await self._write(*unconfirmed):
+                return
+        if not self._pending:
+            return
+        batch, oldest_at = self._pending, self._oldest_at
+        self._pending, self._oldest_at = {}, None
+        await self._write(uuid.uuid4().hex, batch, oldest_at)
+
+    async def _write(self, token: str, batch: dict[str, dict[str, dict[str, Any]]], oldest_at: float | None) -> bool:
+        """Один bulk_write пакета; False — пакет или его часть остались до следующей попытки"""
+        ids = list(batch)
+        requests = [
+            UpdateOne(
+                {"_id": ObjectId(document_id), self.batch_field: {"$ne": token}},
+                {**batch[document_id], "$set": {**batch[document_id].get("$set", {}), self.batch_field: token}},
+            )
+            for document_id in ids
+        ]
+        started = time.perf_counter()
+        try:
+            await self.collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as exc:
+            # остальные обновления применены, повторяем только упавшие
+            errors = {ids[error["index"]]: error.get("errmsg") for error in exc.details.get("writeErrors", [])}
+            self._forget_attempts(document_id for document_id in ids if document_id not in errors)
+            self._requeue(self._retryable(batch, errors), oldest_at)
+            self.written += len(ids) - len(errors)
+            self.failed_flushes += 1
+            logging.warning(f"Отложенная запись: {len(errors)} из {len(ids)} обновлений не применены")
+            return False
+        except ServerSelectionTimeoutError:
+            # сервер не выбран, значит ничего не отправлено: повторяем вместе с новыми обновлениями
+            self._requeue(batch, oldest_at)
+            self.failed_flushes += 1
+            logging.exception(f"Отложенная запись {len(ids)} обновлений не удалась, повторю позже")
+            return False
+        except PyMongoError:
+            # часть пакета могла примениться: повторяем его целиком с тем же токеном
+            self._unconfirmed = (token, batch, oldest_at)
+            self.failed_flushes += 1
+            logging.exception(f"Исход отложенной записи {len(ids)} обновлений неизвестен, повторю тот же пакет")
+            return False
+        except asyncio.CancelledError:
+            # остановка посреди записи: пакет повторит flush() из lifespan
+            self._unconfirmed = (token, batch, oldest_at)
+            raise
+        self._forget_attempts(ids)
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.written += len(ids)
+        return True
+
+    def _retryable(
+        self, batch: dict[str, dict[str, dict[str, Any]]], errors: dict[str, str | None]
+    ) -> dict[str, dict[str, dict[str, Any]]]:
+        """Отклонённые обновления, у которых ещё остались попытки; остальные отбрасываются"""
+        retry = {}
+        for document_id, errmsg in errors.items():
+            attempts = self._attempts.get(document_id, 0) + 1
+            if attempts < self.max_attempts:
+                self._attempts[document_id] = attempts
+                retry[document_id] = batch[document_id]
+                continue
+            self._attempts.pop(document_id, None)
+            self.abandoned += 1
+            logging.error(f"Отложенное обновление {document_id} отброшено после {attempts} попыток: {errmsg}")
+        return retry
+
+    def _forget_attempts(self, document_ids: Any) -> None:
+        if self._attempts:
+            for document_id in document_ids:
+                self._attempts.pop(document_id, None)
+
+    def _requeue(self, batch: dict[str, dict[str, dict[str, Any]]], oldest_at: float | None) -> None:
+        # накопленное после снимка новее, поэтому вливается поверх возвращённого
+        newer, self._pending = self._pending, {}
+        for document_id, update in [*batch.items(), *newer.items()]:
+            pending = self._pending.get(document_id)
+            if pending is None:
+                if len(self._pending) >= self.max_backlog:
+                    self.dropped += 1
+                    continue
+                pending = self._pending[document_id] = {}
+            _merge(pending, update)
+        self._oldest_at = oldest_at if self._pending else None
+
+    def metrics(self) -> dict[str, Any]:
+        oldest_at = min(
+            (at for at in (self._oldest_at, self._unconfirmed[2] if self._unconfirmed else None) if at), default=None
+        )
+        return {
+            "pending": len(self._pending),
+            "unconfirmed": len(self._unconfirmed[1]) if self._unconfirmed else 0,
+            "oldest_pending_seconds": time.monotonic() - oldest_at if oldest_at else 0.0,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "abandoned": self.abandoned,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": self.last_flush_ms,
+        }
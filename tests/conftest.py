@@ -0,0 +1,46 @@
+import os
+
+# настройки читаются при импорте src.config; значения как у бенчмарков
+for _name, _value in {
+    "MODE": "TEST",
+    "DB_HOST": "localhost",
+    "DB_PORT": "27017",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "DB_NAME": "test",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "JWT_SECRET_KEY": "test-secret-key-of-at-least-32-bytes",
+    "JWT_ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    # bcrypt с минимальной стоимостью: тестам нужна логика, а не стойкость хэша
+    "BCRYPT_ROUNDS": "4",
+    "CHANGE_STREAM_ENABLED": "false",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import pytest  # noqa: E402
+
+
+class FakeClock:
+    """Подменяет модуль time в тестируемом модуле: monotonic() двигается только через advance()"""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
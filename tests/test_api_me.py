@@ -0,0 +1,180 @@
+from typing import AsyncIterator
+import asyncio
+import logging
+
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+import httpx
+import pytest
+
+from benchmarks import standins
+from benchmarks.standins import InMemoryDBManager, InMemoryMongoClient, InMemoryRedis
+from src.api.auth import get_me
+from src.api.dependencies import get_db, subject_cache
+from src.init import invalidation_bus, redis_manager
+from src.main import app
+from src.schemas.users import UserAddDTO, UserPutAdminDTO
+from src.services.auth import AuthService
+from src.utils import local_cache
+from src.utils.db_manager import DBManager
+
+PASSWORD = "test-password"
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Приложение поверх стендов в памяти; Redis и кэши воркера пустые"""
+    mongo_client = InMemoryMongoClient()
+    monkeypatch.setattr(redis_manager, "_redis", InMemoryRedis(), raising=False)
+    # скрипты привязаны к экземпляру Redis, как после connect()
+    monkeypatch.setattr(redis_manager, "_scripts", {})
+
+    async def get_memory_db() -> AsyncIterator[DBManager]:
+        async with InMemoryDBManager(mongo_client, "test") as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_memory_db
+    asyncio.run(invalidation_bus.dispatch(None))
+    yield mongo_client
+    app.dependency_overrides.pop(get_db, None)
+    asyncio.run(invalidation_bus.dispatch(None))
+
+
+async def add_user(mongo_client: InMemoryMongoClient, email: str, role: str = "user") -> tuple[str, dict[str, str]]:
+    auth = AuthService()
+    async with InMemoryDBManager(mongo_client, "test") as db:
+        user = await db.users.add(
+            UserAddDTO(
+                first_name="Ivan",
+                last_name="Petrov",
+                email=email,
+                hashed_password=auth.hash_password(PASSWORD),
+                role=role,
+            )
+        )
+    token = auth.create_access_token({"user_id": user.id, "role": user.role})
+    return user.id, {"Cookie": f"access_token={token}"}
+
+
+def client() -> httpx.AsyncClient:
+    # куки не сохраняем: авторизация передаётся заголовком в каждом запросе
+    cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", cookies=cookies)
+
+
+def test_edit_me_invalidates_cached_me(api):
+    async def scenario() -> None:
+        user_id, headers = await add_user(api, "ivan@example.com")
+        async with client() as http:
+            first = await http.get("/auth/me", headers=headers)
+            etag = first.headers["ETag"]
+            assert etag == f'"{user_id}-1"'
+
+            edited = await http.put(
+                "/auth/edit_me",
+                headers=headers,
+                json={"email": "ivan@example.com", "password": PASSWORD, "first_name": "Petr", "last_name": "Petrov"},
+            )
+            assert edited.status_code == 200
+            assert edited.json() == {"status": "OK"}
+
+            conditional = await http.get("/auth/me", headers=headers | {"If-None-Match": etag})
+            assert conditional.status_code == 200
+            assert conditional.headers["ETag"] == f'"{user_id}-2"'
+            assert conditional.json()["first_name"] == "Petr"
+
+    asyncio.run(scenario())
+
+
+def test_admin_edit_invalidates_cached_me_and_subject(api):
+    async def scenario() -> None:
+        user_id, headers = await add_user(api, "ivan@example.com")
+        _, admin_headers = await add_user(api, "admin@example.com", role="admin")
+        async with client() as http:
+            assert (await http.get("/auth/me", headers=headers)).json()["last_name"] == "Petrov"
+            subject_cache.set(user_id, {"id": user_id, "role": "user"})
+            edited = await http.put(
+                "/auth/edit_user",
+                params={"user_edit_email": "ivan@example.com"},
+                headers=admin_headers,
+                json={"email": "ivan@example.com", "first_name": "Ivan", "last_name": "Sidorov"},
+            )
+            assert edited.status_code == 200
+            assert (await http.get("/auth/me", headers=headers)).json()["last_name"] == "Sidorov"
+            assert subject_cache.get(user_id) is None
+
+    asyncio.run(scenario())
+
+
+
+def test_cached_me_does_not_open_mongo_session(api, monkeypatch):
+    sessions: list[object] = []
+    start_session = api.start_session
+
+    async def counting_start_session(*args, **kwargs):
+        session = await start_session(*args, **kwargs)
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(api, "start_session", counting_start_session)
+
+    async def scenario() -> None:
+        _, headers = await add_user(api, "ivan@example.com")
+        sessions.clear()
+        async with client() as http:
+            etag = (await http.get("/auth/me", headers=headers)).headers["ETag"]
+            assert len(sessions) == 1
+            assert (await http.get("/auth/me", headers=headers)).status_code == 200
+            assert (await http.get("/auth/me", headers=headers | {"If-None-Match": etag})).status_code == 304
+        # ответы из кэша сессию не открывали: она была только у первого запроса, который читал Mongo
+        assert len(sessions) == 1
+
+    asyncio.run(scenario())
+
+def test_local_copy_expires_with_redis_entry(api, clock, monkeypatch):
+    monkeypatch.setattr(local_cache, "time", clock)
+    monkeypatch.setattr(standins, "time", clock)
+
+    async def scenario() -> None:
+        user_id, headers = await add_user(api, "ivan@example.com")
+        async with client() as http:
+            await http.get("/auth/me", headers=headers)
+            clock.advance(8)
+            # как в соседнем воркере: локальной копии нет, запись берётся из Redis за 2 с до истечения
+            get_me.invalidate_local()
+            assert (await http.get("/auth/me", headers=headers)).json()["last_name"] == "Petrov"
+
+            # изменение мимо сервиса, без инвалидации — видно только после TTL записи в Redis
+            async with InMemoryDBManager(api, "test") as db:
+                await db.users.edit(
+                    UserPutAdminDTO(email="ivan@example.com", first_name="Ivan", last_name="Sidorov"), id=user_id
+                )
+            clock.advance(3)
+            assert (await http.get("/auth/me", headers=headers)).json()["last_name"] == "Sidorov"
+
+    asyncio.run(scenario())
+
+
+
+def test_cache_miss_waits_for_at_most_one_redis_timeout(api, monkeypatch, caplog):
+    # чтение со вторичного узла: обработчику нужно время последней записи из Redis
+    monkeypatch.setattr(InMemoryDBManager, "secondaries_available", True)
+    monkeypatch.setattr(redis_manager, "op_timeout", 0.01)
+
+    async def scenario() -> None:
+        _, headers = await add_user(api, "ivan@example.com")
+        redis_manager.breaker.record_success()
+        redis_manager._redis.latency = 10.0
+        try:
+            async with client() as http:
+                with caplog.at_level(logging.WARNING):
+                    response = await http.get("/auth/me", headers=headers)
+        finally:
+            redis_manager._redis.latency = 0.0
+            redis_manager.breaker.record_success()
+        assert response.status_code == 200
+        assert response.json()["last_name"] == "Petrov"
+
+    asyncio.run(scenario())
+    # таймаут ждало только чтение кэша; время записи и запись в кэш Redis уже не трогали
+    timeouts = [record.getMessage() for record in caplog.records if "не выполнен" in record.getMessage()]
+    assert timeouts == ["Redis get_with_ttl не выполнен: TimeoutError()"]
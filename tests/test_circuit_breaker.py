@@ -0,0 +1,56 @@
+import pytest
+
+from src.utils import circuit_breaker
+from src.utils.circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def breaker(clock, monkeypatch) -> CircuitBreaker:
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return CircuitBreaker(failure_threshold=3, reset_timeout=5.0)
+
+
+def test_opens_after_consecutive_failures(breaker):
+    for _ in range(2):
+        breaker.record_failure()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert not breaker.is_open
+
+
+def test_half_open_lets_one_probe_per_reset_timeout(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.advance(5.0)
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # проба не удалась — следующая только через reset_timeout
+    breaker.record_failure()
+    clock.advance(4.9)
+    assert not breaker.allow()
+    clock.advance(0.1)
+    assert breaker.allow()
+
+
+def test_successful_probe_closes(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(5.0)
+    assert breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+    assert breaker.allow()
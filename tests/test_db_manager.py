@@ -0,0 +1,68 @@
+import asyncio
+
+from pymongo.read_preferences import Secondary, SecondaryPreferred
+from pymongo.topology_description import TOPOLOGY_TYPE
+
+from benchmarks.standins import InMemoryMongoClient
+from src.schemas.users import UserAddDTO
+from src.services import auth
+from src.services.auth import AuthService
+from src.utils.db_manager import DBManager
+
+
+class FakeTopology:
+    def __init__(self, topology_type: int, readable_secondary: bool = False) -> None:
+        self.topology_type = topology_type
+        self.readable_secondary = readable_secondary
+
+    def has_readable_server(self, read_preference) -> bool:
+        assert isinstance(read_preference, Secondary)
+        return self.readable_secondary
+
+
+def make_db(topology: FakeTopology, secondary_reads=None) -> DBManager:
+    client = InMemoryMongoClient()
+    client.topology_description = topology  # type: ignore
+    return DBManager("", "test", secondary_reads=secondary_reads, client=client)  # type: ignore
+
+
+def test_primary_reads_never_use_secondaries():
+    db = make_db(FakeTopology(TOPOLOGY_TYPE.ReplicaSetWithPrimary, readable_secondary=True))
+    assert not db.secondaries_available
+
+
+def test_standalone_server_has_no_secondaries():
+    db = make_db(FakeTopology(TOPOLOGY_TYPE.Single), SecondaryPreferred(max_staleness=90))
+    assert not db.secondaries_available
+
+
+def test_replica_set_depends_on_readable_secondary():
+    preference = SecondaryPreferred(max_staleness=90)
+    assert make_db(FakeTopology(TOPOLOGY_TYPE.ReplicaSetWithPrimary, True), preference).secondaries_available
+    assert not make_db(FakeTopology(TOPOLOGY_TYPE.ReplicaSetWithPrimary, False), preference).secondaries_available
+
+
+def test_sharded_cluster_is_assumed_to_read_from_secondaries():
+    assert make_db(FakeTopology(TOPOLOGY_TYPE.Sharded), SecondaryPreferred(max_staleness=90)).secondaries_available
+
+
+def test_get_user_catches_up_only_when_secondary_serves_read(monkeypatch):
+    calls: list[str] = []
+
+    async def catch_up(user_id: str, session) -> bool:
+        calls.append(user_id)
+        return True
+
+    monkeypatch.setattr(auth.last_write_times, "catch_up", catch_up)
+
+    async def scenario(db: DBManager) -> None:
+        user = await db.users.add(
+            UserAddDTO(first_name="Ivan", last_name="Petrov", email="ivan@example.com", hashed_password="h", role="user")
+        )
+        await AuthService(db).get_user(user.id)
+
+    preference = SecondaryPreferred(max_staleness=90)
+    asyncio.run(scenario(make_db(FakeTopology(TOPOLOGY_TYPE.Single), preference)))
+    assert calls == []
+    asyncio.run(scenario(make_db(FakeTopology(TOPOLOGY_TYPE.ReplicaSetWithPrimary, True), preference)))
+    assert len(calls) == 1
@@ -0,0 +1,221 @@
+import asyncio
+
+from bson import BSON, ObjectId
+from pymongo.errors import OperationFailure
+
+from benchmarks.standins import InMemoryCollection, InMemoryRedis
+from src.connectors.redis_connector import RedisManager
+from src.utils.invalidation import ChangeStreamWatcher, InvalidationBus
+
+ACTIVITY_FIELDS = ("last_login_at", "login_count", "activity_batch")
+
+
+def make_bus() -> InvalidationBus:
+    redis_manager = RedisManager("memory", 0)
+    redis_manager._redis = InMemoryRedis()  # type: ignore
+    return InvalidationBus(redis_manager, channel="test")
+
+
+def test_shared_handlers_run_once_in_publisher_and_local_in_every_worker():
+    publisher, other = make_bus(), make_bus()
+    other.redis_manager = publisher.redis_manager
+    calls: list[tuple[str, str | None]] = []
+    for name, bus in (("publisher", publisher), ("other", other)):
+        bus.subscribe(lambda user_id, name=name: calls.append((f"{name}:local", user_id)))
+        bus.subscribe_shared(lambda user_id, name=name: calls.append((f"{name}:shared", user_id)))
+
+    async def scenario() -> None:
+        listener = asyncio.create_task(other.listen())
+        await asyncio.sleep(0)
+        await publisher.notify("42")
+        await asyncio.sleep(0.01)
+        listener.cancel()
+
+    asyncio.run(scenario())
+    assert calls == [("publisher:shared", "42"), ("publisher:local", "42"), ("other:local", "42")]
+
+
+def test_notify_without_redis_still_clears_own_caches():
+    bus = make_bus()
+    bus.redis_manager.breaker.allow = lambda: False  # type: ignore
+    calls: list[str | None] = []
+    bus.subscribe(calls.append)
+
+    asyncio.run(bus.notify("42"))
+    assert calls == ["42"]
+
+
+def make_collection() -> tuple[InMemoryCollection, ObjectId]:
+    collection = InMemoryCollection("users")
+    document_id = ObjectId()
+    collection._documents[document_id] = {"_id": document_id, "role": "admin", "version": 1, "login_count": 0}
+    return collection, document_id
+
+
+async def watch(bus: InvalidationBus, watcher: ChangeStreamWatcher, writes) -> None:
+    """Запускает подписку и наблюдателя, выполняет writes и ждёт доставки событий"""
+    tasks = [asyncio.create_task(bus.listen()), asyncio.create_task(watcher.run())]
+    await asyncio.sleep(0.01)
+    await writes()
+    await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_watcher_publishes_raw_update_without_version_and_skips_activity():
+    bus = make_bus()
+    collection, document_id = make_collection()
+    published: list[str | None] = []
+    bus.subscribe(published.append)
+    watcher = ChangeStreamWatcher(collection, bus, bus.redis_manager, ignored_fields=ACTIVITY_FIELDS)
+
+    async def writes() -> None:
+        await collection.update_one(
+            {"_id": document_id},
+            {"$set": {"activity_batch": "token"}, "$max": {"last_login_at": 5}, "$inc": {"login_count": 1}},
+        )
+        # понижение роли прямо в Mongo, мимо BaseRepository.edit: версия не меняется
+        await collection.update_one({"_id": document_id}, {"$set": {"role": "user"}})
+
+    asyncio.run(watch(bus, watcher, writes))
+    assert published == [str(document_id)]
+
+
+class FailingStream:
+    """Change stream, который падает при открытии с OperationFailure кода code"""
+
+    def __init__(self, code: int) -> None:
+        self.code = code
+
+    async def __aenter__(self) -> "FailingStream":
+        raise OperationFailure("change stream failed", code=self.code)
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+
+def test_only_lock_holder_follows_and_standby_takes_over():
+    bus = make_bus()
+    collection, document_id = make_collection()
+    published: list[str | None] = []
+    bus.subscribe(published.append)
+    leader, standby = (ChangeStreamWatcher(collection, bus, bus.redis_manager, lock_ttl_ms=150) for _ in range(2))
+
+    async def scenario() -> None:
+        listener = asyncio.create_task(bus.listen())
+        leader_task = asyncio.create_task(leader.run())
+        await asyncio.sleep(0.01)
+        standby_task = asyncio.create_task(standby.run())
+        await asyncio.sleep(0.01)
+        assert await bus.redis_manager.get(leader.lock_key) == leader.owner.encode()
+
+        await collection.update_one({"_id": document_id}, {"$set": {"role": "user"}})
+        await asyncio.sleep(0.05)
+        # событие публикует один лидер, а не оба наблюдателя
+        assert published == [str(document_id)]
+
+        # лидер упал: блокировка истекает, и поток подхватывает второй наблюдатель
+        leader_task.cancel()
+        await asyncio.sleep(0.3)
+        assert await bus.redis_manager.get(leader.lock_key) == standby.owner.encode()
+        await collection.update_one({"_id": document_id}, {"$set": {"role": "admin"}})
+        await asyncio.sleep(0.05)
+        assert published == [str(document_id)] * 2
+
+        for task in (listener, leader_task, standby_task):
+            task.cancel()
+        await asyncio.gather(listener, leader_task, standby_task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_leader_stops_following_when_lock_is_taken_over():
+    bus = make_bus()
+    collection, document_id = make_collection()
+    published: list[str | None] = []
+    bus.subscribe(published.append)
+    watcher = ChangeStreamWatcher(collection, bus, bus.redis_manager, lock_ttl_ms=150)
+
+    async def writes() -> None:
+        # блокировку занял другой процесс (например, лидер после паузы GC): поток больше не читаем
+        await bus.redis_manager._redis.set(watcher.lock_key, b"other", ex=10)  # type: ignore
+        await asyncio.sleep(0.1)
+        await collection.update_one({"_id": document_id}, {"$set": {"role": "user"}})
+
+    asyncio.run(watch(bus, watcher, writes))
+    assert published == []
+    assert collection._streams == set()
+
+
+def test_resume_token_round_trip_replays_changes_missed_during_restart():
+    bus = make_bus()
+    collection, document_id = make_collection()
+    published: list[str | None] = []
+    bus.subscribe(published.append)
+
+    async def scenario() -> None:
+        listener = asyncio.create_task(bus.listen())
+        first = ChangeStreamWatcher(collection, bus, bus.redis_manager)
+        task = asyncio.create_task(first.run())
+        await asyncio.sleep(0.01)
+        await collection.update_one({"_id": document_id}, {"$set": {"role": "user"}})
+        await asyncio.sleep(0.02)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        # токен хранится в Redis как BSON и читается обратно тем же документом
+        assert await first._load_resume_token() == collection._changes[-1]["_id"]
+
+        await bus.redis_manager.delete(first.lock_key)
+        for role in ("author", "admin"):
+            await collection.update_one({"_id": document_id}, {"$set": {"role": role}})
+        task = asyncio.create_task(ChangeStreamWatcher(collection, bus, bus.redis_manager).run())
+        await asyncio.sleep(0.05)
+        for pending in (listener, task):
+            pending.cancel()
+        await asyncio.gather(listener, task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert published == [str(document_id)] * 3
+
+
+def test_lost_history_resets_token_and_broadcasts_invalidate_all():
+    bus = make_bus()
+    collection, document_id = make_collection()
+    published: list[str | None] = []
+    bus.subscribe(published.append)
+    watcher = ChangeStreamWatcher(collection, bus, bus.redis_manager, lock_ttl_ms=60)
+    watch_stream = collection.watch
+    opened: list[object] = []
+
+    def watch_with_lost_history(pipeline=None, resume_after=None):
+        opened.append(resume_after)
+        if len(opened) == 1:
+            return FailingStream(ChangeStreamWatcher.CHANGE_STREAM_HISTORY_LOST)
+        return watch_stream(pipeline, resume_after=resume_after)
+
+    collection.watch = watch_with_lost_history  # type: ignore
+    # токен указывает на событие, которого в истории уже нет
+    asyncio.run(bus.redis_manager.set(watcher.token_key, BSON.encode({"_data": "00000000000000ff"})))
+
+    async def writes() -> None:
+        await asyncio.sleep(0.1)
+        await collection.update_one({"_id": document_id}, {"$set": {"role": "user"}})
+
+    asyncio.run(watch(bus, watcher, writes))
+    assert published[0] is None
+    assert published[1:] == [str(document_id)]
+    assert opened[0] == {"_data": "00000000000000ff"}
+    # после потери истории поток открывается заново с текущего момента, без токена
+    assert opened[1] is None
+
+
+def test_watcher_exits_without_replica_set():
+    bus = make_bus()
+    collection, _ = make_collection()
+    collection.watch = lambda pipeline=None, resume_after=None: FailingStream(  # type: ignore
+        ChangeStreamWatcher.CHANGE_STREAM_UNSUPPORTED
+    )
+    watcher = ChangeStreamWatcher(collection, bus, bus.redis_manager)
+
+    asyncio.run(asyncio.wait_for(watcher.run(), timeout=1))
@@ -0,0 +1,44 @@
+import pytest
+
+from src.utils import local_cache
+from src.utils.local_cache import LocalCache
+
+
+@pytest.fixture
+def cache(clock, monkeypatch) -> LocalCache:
+    monkeypatch.setattr(local_cache, "time", clock)
+    return LocalCache(maxsize=3, ttl=10)
+
+
+def test_entry_expires_after_ttl(cache, clock):
+    cache.set("a", 1)
+    clock.advance(9.9)
+    assert cache.get("a") == 1
+    clock.advance(0.1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_overrides_default(cache, clock):
+    cache.set("a", 1, ttl=2)
+    clock.advance(2)
+    assert cache.get("a") is None
+
+
+def test_evicts_least_recently_used(cache):
+    for key in "abc":
+        cache.set(key, key)
+    cache.get("a")
+    cache.set("d", "d")
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["a", "c", "d"]
+
+
+def test_invalidate_one_or_all(cache):
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    cache.invalidate(None)
+    assert len(cache) == 0
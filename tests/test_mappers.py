@@ -0,0 +1,59 @@
+from typing import NamedTuple
+
+from bson import ObjectId
+import pytest
+
+from src.repositories.mappers.base import RecordDataMapper
+from src.repositories.mappers.mappers import UserDataMapper, UserWithHashedPasswordDataMapper
+from src.schemas.users import UserDTO, UserRecord
+
+
+def make_document(**fields) -> dict:
+    return {
+        "_id": ObjectId(),
+        "first_name": "Ivan",
+        "last_name": "Petrov",
+        "email": "ivan@example.com",
+        "role": "user",
+        "hashed_password": "hash",
+        "version": 4,
+    } | fields
+
+
+def test_projection_lists_record_fields_without_id():
+    assert UserDataMapper.projection == {"first_name": 1, "last_name": 1, "email": 1, "role": 1, "version": 1}
+    assert "hashed_password" in UserWithHashedPasswordDataMapper.projection
+    assert "_id" not in UserDataMapper.projection
+
+
+def test_maps_document_without_mutating_it():
+    document = make_document()
+    snapshot = dict(document)
+    record = UserDataMapper.map_to_domain_entity(document)
+
+    assert record == UserRecord(str(document["_id"]), "Ivan", "Petrov", "ivan@example.com", "user", 4)
+    assert document == snapshot
+    assert UserDataMapper.map_to_domain_entity(None) is None
+
+
+def test_missing_field_takes_record_default():
+    document = make_document()
+    del document["version"]
+    assert UserDataMapper.map_to_domain_entity(document).version == 0
+
+
+def test_to_dto_carries_all_fields():
+    record = UserDataMapper.map_to_domain_entity(make_document())
+    dto = record.to_dto()
+    assert isinstance(dto, UserDTO)
+    assert dto.model_dump() == record._asdict()
+
+
+def test_record_must_start_with_id():
+    class NoId(NamedTuple):
+        name: str
+
+    with pytest.raises(TypeError):
+
+        class NoIdMapper(RecordDataMapper[NoId]):
+            schema = NoId
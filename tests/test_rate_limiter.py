@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from benchmarks import standins
+from benchmarks.standins import InMemoryRedis
+from src.connectors.redis_connector import RedisManager
+from src.exceptions import TooManyLoginAttemptsException
+from src.utils import rate_limiter
+from src.utils.rate_limiter import LoginRateLimiter
+
+
+@pytest.fixture
+def limiter(clock, monkeypatch) -> LoginRateLimiter:
+    monkeypatch.setattr(standins, "time", clock)
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    redis_manager = RedisManager("memory", 0)
+    redis_manager._redis = InMemoryRedis()  # type: ignore
+    return LoginRateLimiter(
+        redis_manager, ip_capacity=10, ip_refill=1.0, email_capacity=3, email_refill=0.5, blocked_cache_size=100
+    )
+
+
+def check(limiter: LoginRateLimiter, ip: str | None, email: str) -> None:
+    asyncio.run(limiter.check(ip, email))
+
+
+def test_email_bucket_allows_capacity_then_blocks(limiter):
+    for _ in range(3):
+        check(limiter, "10.0.0.1", "user@example.com")
+    with pytest.raises(TooManyLoginAttemptsException) as exc:
+        check(limiter, "10.0.0.1", "user@example.com")
+    # пополнение 0.5 токена в секунду — следующий токен через 2 с
+    assert exc.value.retry_after == 2
+
+
+def test_email_is_case_insensitive(limiter):
+    for email in ("User@example.com", "USER@example.com", "user@example.com"):
+        check(limiter, None, email)
+    with pytest.raises(TooManyLoginAttemptsException):
+        check(limiter, None, "uSeR@example.com")
+
+
+def test_refill_after_wait(limiter, clock):
+    for _ in range(3):
+        check(limiter, None, "user@example.com")
+    with pytest.raises(TooManyLoginAttemptsException):
+        check(limiter, None, "user@example.com")
+    clock.advance(2)
+    check(limiter, None, "user@example.com")
+
+
+def test_token_taken_only_when_all_buckets_allow(limiter):
+    for i in range(3):
+        check(limiter, "10.0.0.1", "user@example.com")
+    with pytest.raises(TooManyLoginAttemptsException):
+        check(limiter, "10.0.0.1", "user@example.com")
+    # отказ по email не списал токен из корзины IP: у IP осталось 10 - 3
+    for i in range(7):
+        check(limiter, "10.0.0.1", f"other{i}@example.com")
+    with pytest.raises(TooManyLoginAttemptsException):
+        check(limiter, "10.0.0.1", "another@example.com")
+
+
+def test_blocked_key_rejected_locally_without_redis(limiter):
+    for _ in range(3):
+        check(limiter, None, "user@example.com")
+    with pytest.raises(TooManyLoginAttemptsException):
+        check(limiter, None, "user@example.com")
+
+    calls = []
+    original = limiter.redis_manager.take_tokens
+
+    async def counting(buckets):
+        calls.append(buckets)
+        return await original(buckets)
+
+    limiter.redis_manager.take_tokens = counting  # type: ignore
+    with pytest.raises(TooManyLoginAttemptsException):
+        check(limiter, None, "user@example.com")
+    assert calls == []
+
+
+def test_local_buckets_limit_logins_while_redis_is_unavailable(limiter, clock):
+    limiter.redis_manager.breaker.allow = lambda: False  # type: ignore
+    for _ in range(3):
+        check(limiter, "10.0.0.1", "user@example.com")
+    with pytest.raises(TooManyLoginAttemptsException) as exc:
+        check(limiter, "10.0.0.1", "user@example.com")
+    assert exc.value.retry_after == 2
+    clock.advance(2)
+    check(limiter, "10.0.0.1", "user@example.com")
+
+
+def test_local_buckets_split_capacity_between_workers(limiter):
+    limiter.redis_manager.breaker.allow = lambda: False  # type: ignore
+    limiter.workers = 3
+    check(limiter, None, "user@example.com")
+    with pytest.raises(TooManyLoginAttemptsException):
+        check(limiter, None, "user@example.com")
+
+
+def test_local_buckets_are_bounded(limiter):
+    limiter.redis_manager.breaker.allow = lambda: False  # type: ignore
+    for i in range(150):
+        check(limiter, None, f"user{i}@example.com")
+    assert len(limiter._local_buckets) == limiter.blocked_cache_size
@@ -0,0 +1,33 @@
+import asyncio
+
+from benchmarks.standins import InMemoryMongoClient
+from src.repositories.users import UsersRepository
+from src.schemas.users import UserAddDTO, UserHashedPasswordDTO, UserPutAdminDTO
+
+
+def make_repository() -> UsersRepository:
+    return UsersRepository(InMemoryMongoClient()["test"])  # type: ignore
+
+
+def add_user(users: UsersRepository):
+    return asyncio.run(
+        users.add(
+            UserAddDTO(first_name="Ivan", last_name="Petrov", email="ivan@example.com", hashed_password="h", role="user")
+        )
+    )
+
+
+def test_edit_bumps_version():
+    users = make_repository()
+    user = add_user(users)
+    asyncio.run(users.edit(UserPutAdminDTO(email=user.email, first_name="Petr", last_name="Petrov"), id=user.id))
+    assert asyncio.run(users.get_one(id=user.id)).version == user.version + 1
+
+
+def test_unversioned_edit_keeps_version():
+    users = make_repository()
+    user = add_user(users)
+    asyncio.run(users.edit(UserHashedPasswordDTO(hashed_password="rehashed"), versioned=False, id=user.id))
+    assert asyncio.run(users.get_one(id=user.id)).version == user.version
+    stored = asyncio.run(users.get_user_with_hashed_password(email=user.email))
+    assert stored.hashed_password == "rehashed"
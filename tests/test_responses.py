@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+import uuid
+
+import pytest
+
+from src.api.responses import dumps
+from src.schemas.responses import StatusDTO
+
+
+def test_dumps_serializes_models_and_native_types():
+    moment = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    assert dumps({"status": StatusDTO(), "at": moment, 1: None}) == (
+        b'{"status":{"status":"OK"},"at":"2024-01-02T03:04:05+00:00","1":null}'
+    )
+    assert dumps(uuid.UUID(int=0)) == b'"00000000-0000-0000-0000-000000000000"'
+
+
+def test_dumps_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
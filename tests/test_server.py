@@ -0,0 +1,177 @@
+from pathlib import Path
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+# мастер с заглушкой вместо приложения: порт печатается первой строкой stdout
+MASTER_SCRIPT = """
+import asyncio
+import logging
+import os
+import sys
+
+from src.config import settings
+
+settings.WORKER_MAX_REQUESTS = int(sys.argv[2])
+settings.WORKER_GRACEFUL_TIMEOUT = 5
+from src.server import Arbiter, listen_socket
+
+FAIL_STARTUP = sys.argv[3] == "fail"
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if FAIL_STARTUP:
+                    await send({"type": "lifespan.startup.failed", "message": "boom"})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            else:
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    await asyncio.sleep(0.01)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": f"{os.getpid()} {os.getppid()}".encode()})
+
+
+logging.basicConfig(level=logging.INFO)
+sock = listen_socket("127.0.0.1", 0, 128)
+print(sock.getsockname()[1], flush=True)
+Arbiter(app, sock, int(sys.argv[1])).run()
+"""
+
+
+class Master:
+    def __init__(self, workers: int, max_requests: int = 0, startup: str = "ok") -> None:
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", MASTER_SCRIPT, str(workers), str(max_requests), startup],
+            cwd=ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        self.url = f"http://127.0.0.1:{self.process.stdout.readline().strip()}/"  # type: ignore
+
+    def get_pids(self) -> tuple[int, int]:
+        """pid ответившего воркера и его мастера"""
+        # новый клиент на каждый запрос: отдельное соединение может достаться любому воркеру
+        response = httpx.get(self.url, timeout=10)
+        assert response.status_code == 200
+        worker, master = response.text.split()
+        return int(worker), int(master)
+
+    def get_pid(self) -> int:
+        return self.get_pids()[0]
+
+    def stop(self, timeout: float = 20) -> str:
+        self.process.send_signal(signal.SIGTERM)
+        _, stderr = self.process.communicate(timeout=timeout)
+        return stderr
+
+
+def wait_for_pids(master: Master, count: int, timeout: float = 10) -> set[int]:
+    pids: set[int] = set()
+    deadline = time.monotonic() + timeout
+    while len(pids) < count:
+        assert time.monotonic() < deadline, f"ответили только воркеры {pids}"
+        pids.add(master.get_pid())
+    return pids
+
+
+@pytest.fixture
+def master_factory():
+    masters: list[Master] = []
+
+    def start(*args, **kwargs) -> Master:
+        masters.append(Master(*args, **kwargs))
+        return masters[-1]
+
+    yield start
+    for master in masters:
+        if master.process.poll() is None:
+            master.stop()
+
+
+def test_workers_are_recycled_after_max_requests(master_factory):
+    master = master_factory(workers=2, max_requests=5)
+    pids = [master.get_pid() for _ in range(40)]
+    # 40 запросов при лимите 5 на воркер: воркеры менялись, ни один запрос не потерян
+    assert len(set(pids)) >= 6
+    assert master.process.poll() is None
+
+
+def test_sighup_replaces_every_worker_without_failed_requests(master_factory):
+    master = master_factory(workers=2)
+    old = wait_for_pids(master, 2)
+    master.process.send_signal(signal.SIGHUP)
+
+    new: set[int] = set()
+    deadline = time.monotonic() + 20
+    while len(new) < 2 or any(_alive(pid) for pid in old):
+        assert time.monotonic() < deadline, f"старые воркеры {old} не заменены, новые {new}"
+        pid = master.get_pid()
+        if pid not in old:
+            new.add(pid)
+    assert "Перезапуск воркеров по одному" in master.stop()
+
+
+def test_sigusr2_hands_socket_to_new_master_without_failed_requests(master_factory):
+    master = master_factory(workers=2)
+    old = wait_for_pids(master, 2)
+    master.process.send_signal(signal.SIGUSR2)
+
+    new: set[int] = set()
+    successor = None
+    try:
+        deadline = time.monotonic() + 20
+        while len(new) < 2 or master.process.poll() is None:
+            assert time.monotonic() < deadline, f"старый мастер не остановлен, новые воркеры {new}"
+            pid, parent = master.get_pids()
+            if pid not in old:
+                new.add(pid)
+                successor = parent
+        # новый мастер — отдельно запущенный процесс, а не форк старого; старый вышел сам
+        assert successor != master.process.pid
+        assert master.process.returncode == 0
+        assert not any(_alive(pid) for pid in old)
+        assert master.get_pid() in new
+    finally:
+        if successor is not None:
+            os.kill(successor, signal.SIGTERM)
+    deadline = time.monotonic() + 20
+    while _alive(successor):
+        assert time.monotonic() < deadline, f"новый мастер {successor} не остановился"
+        time.sleep(0.1)
+
+
+def test_crashing_worker_is_respawned_with_pause_and_master_stays_responsive(master_factory):
+    master = master_factory(workers=1, startup="fail")
+    time.sleep(2.5)
+    started = time.monotonic()
+    stderr = master.stop(timeout=10)
+    # без паузы мастер форкал бы воркеры десятками; SIGTERM обрабатывается сразу, а не после sleep
+    assert 1 <= stderr.count("завершился с кодом") <= 4
+    assert time.monotonic() - started < 0.5
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # новый мастер после выхода старого не наш потомок: если его не подберёт init, он останется зомби
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        # без procfs зомби от живого процесса не отличить
+        return True
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError, ServerSelectionTimeoutError
+
+from benchmarks.standins import InMemoryCollection
+from src.utils.write_behind import WriteBehindBuffer
+
+
+def make_collection(count: int) -> tuple[InMemoryCollection, list[str]]:
+    collection = InMemoryCollection("users")
+    ids = []
+    for _ in range(count):
+        document_id = ObjectId()
+        collection._documents[document_id] = {"_id": document_id, "login_count": 0}
+        ids.append(str(document_id))
+    return collection, ids
+
+
+def test_record_merges_updates_per_document():
+    buffer = WriteBehindBuffer(flush_size=100, flush_interval=1.0, max_backlog=100)
+    buffer.record("a", {"$inc": {"login_count": 1}, "$max": {"last_login_at": 5}})
+    buffer.record("a", {"$inc": {"login_count": 2}, "$max": {"last_login_at": 3}, "$set": {"ip": "x"}})
+    buffer.record("a", {"$set": {"ip": "y"}, "$min": {"first": 2}})
+    assert buffer._pending == {
+        "a": {"$inc": {"login_count": 3}, "$max": {"last_login_at": 5}, "$set": {"ip": "y"}, "$min": {"first": 2}}
+    }
+    assert buffer.metrics()["pending"] == 1
+    assert buffer.recorded == 3
+
+
+def test_flush_writes_one_bulk_write():
+    collection, ids = make_collection(2)
+    buffer = WriteBehindBuffer(flush_size=100, flush_interval=1.0, max_backlog=100)
+    buffer.collection = collection
+    for document_id in ids * 2:
+        buffer.record(document_id, {"$inc": {"login_count": 1}})
+    asyncio.run(buffer.flush())
+
+    assert [doc["login_count"] for doc in collection._documents.values()] == [2, 2]
+    metrics = buffer.metrics()
+    assert (metrics["pending"], metrics["written"], metrics["flushes"]) == (0, 2, 1)
+
+
+def test_backlog_cap_drops_new_documents_only():
+    buffer = WriteBehindBuffer(flush_size=100, flush_interval=1.0, max_backlog=2)
+    buffer.record("a", {"$inc": {"n": 1}})
+    buffer.record("b", {"$inc": {"n": 1}})
+    buffer.record("c", {"$inc": {"n": 1}})
+    # уже накопленный документ продолжает сливать обновления
+    buffer.record("a", {"$inc": {"n": 1}})
+    assert set(buffer._pending) == {"a", "b"}
+    assert buffer._pending["a"] == {"$inc": {"n": 2}}
+    assert buffer.dropped == 1
+
+
+def test_bulk_write_error_requeues_only_failed_updates():
+    collection, ids = make_collection(3)
+
+    async def failing_bulk_write(requests, ordered=True, session=None):
+        raise BulkWriteError({"writeErrors": [{"index": 1, "code": 2, "errmsg": "bad"}]})
+
+    collection.bulk_write = failing_bulk_write  # type: ignore
+    buffer = WriteBehindBuffer(flush_size=100, flush_interval=1.0, max_backlog=100)
+    buffer.collection = collection
+    for document_id in ids:
+        buffer.record(document_id, {"$inc": {"login_count": 1}})
+    asyncio.run(buffer.flush())
+
+    assert list(buffer._pending) == [ids[1]]
+    assert buffer.written == 2
+    assert buffer.failed_flushes == 1
+
+
+def test_requeue_merges_newer_updates_on_top():
+    buffer = WriteBehindBuffer(flush_size=100, flush_interval=1.0, max_backlog=100)
+    buffer.record("a", {"$inc": {"n": 1}, "$set": {"ip": "new"}})
+    buffer._requeue({"a": {"$inc": {"n": 2}, "$set": {"ip": "old"}}}, oldest_at=1.0)
+    assert buffer._pending["a"] == {"$inc": {"n": 3}, "$set": {"ip": "new"}}
+
+
+def test_rejected_update_is_abandoned_after_max_attempts():
+    collection, ids = make_collection(2)
+
+    async def rejecting_bulk_write(requests, ordered=True, session=None):
+        raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "validation failed"}]})
+
+    collection.bulk_write = rejecting_bulk_write  # type: ignore
+    buffer = WriteBehindBuffer(flush_size=100, flush_interval=1.0, max_backlog=100, max_attempts=3)
+    buffer.collection = collection
+    buffer.record(ids[0], {"$inc": {"login_count": 1}})
+    for _ in range(2):
+        asyncio.run(buffer.flush())
+        assert list(buffer._pending) == [ids[0]]
+    asyncio.run(buffer.flush())
+
+    assert buffer._pending == {}
+    assert buffer._attempts == {}
+    assert buffer.metrics()["abandoned"] == 1
+
+
+def test_unknown_outcome_retries_same_batch_without_double_increment():
+    collection, ids = make_collection(2)
+    bulk_write = collection.bulk_write
+    calls = 0
+
+    async def bulk_write_then_disconnect(requests, ordered=True, session=None):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            # первый документ записан, ответ потерян
+            await bulk_write(requests[:1], ordered=ordered, session=session)
+            raise AutoReconnect("connection reset")
+        return await bulk_write(requests, ordered=ordered, session=session)
+
+    collection.bulk_write = bulk_write_then_disconnect  # type: ignore
+    buffer = WriteBehindBuffer(flush_size=100, flush_interval=1.0, max_backlog=100)
+    buffer.collection = collection
+    for document_id in ids:
+        buffer.record(document_id, {"$inc": {"login_count": 1}})
+    asyncio.run(buffer.flush())
+    assert buffer.metrics()["unconfirmed"] == 2
+
+    buffer.record(ids[0], {"$inc": {"login_count": 1}})
+    asyncio.run(buffer.flush())
+
+    assert [doc["login_count"] for doc in collection._documents.values()] == [2, 1]
+    metrics = buffer.metrics()
+    assert (metrics["pending"], metrics["unconfirmed"], metrics["failed_flushes"]) == (0, 0, 1)
+
+
+def test_server_selection_timeout_requeues_whole_batch():
+    collection, ids = make_collection(1)
+
+    async def unreachable_bulk_write(requests, ordered=True, session=None):
+        raise ServerSelectionTimeoutError("no servers")
+
+    collection.bulk_write = unreachable_bulk_write  # type: ignore
+    buffer = WriteBehindBuffer(flush_size=100, flush_interval=1.0, max_backlog=100)
+    buffer.collection = collection
+    buffer.record(ids[0], {"$inc": {"login_count": 1}})
+    asyncio.run(buffer.flush())
+    buffer.record(ids[0], {"$inc": {"login_count": 2}})
+
+    assert buffer._pending == {ids[0]: {"$inc": {"login_count": 3}}}
+    assert buffer.metrics()["unconfirmed"] == 0
+
+
+def test_run_logs_metrics_periodically(caplog):
+    collection, ids = make_collection(1)
+    buffer = WriteBehindBuffer(flush_size=100, flush_interval=0.01, max_backlog=100, metrics_interval=0.01)
+
+    async def scenario() -> None:
+        task = asyncio.create_task(buffer.run(collection))
+        buffer.record(ids[0], {"$inc": {"login_count": 1}})
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    with caplog.at_level(logging.INFO):
+        asyncio.run(scenario())
+    assert any("Отложенная запись активности" in record.message for record in caplog.records)